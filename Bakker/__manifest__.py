@@ -1,6 +1,6 @@
 {
     "name": "Bakker",  # The name that will appear in the App list
-    "version": "18.0.1.0.5",  # Version
+    "version": "18.0.1.1.0",  # Version
     "application": True,  # This line says the module is an App, and not a module
     "depends": ["base", "mail"],  # dependencies
     "data": [
@@ -8,11 +8,22 @@
         "data/bakker_koeken_tags_data.xml",
         "data/bakker_koeken_data.xml",
         "data/bakker_email_template.xml",
+        "data/bakker_verkoop_sequence.xml",
+        "data/bakker_partner_data.xml",
+        "data/bakker_config_data.xml",
+        "data/bakker_cron.xml",
         "security/ir.model.access.csv",
         "views/bakker_koeken_categorie_views.xml",
         "views/bakker_koeken_tags_views.xml",
         "views/bakker_koeken_views.xml",
+        "views/bakker_koeken_import_views.xml",
         "views/bakker_verkoop_views.xml",
+        "views/bakker_verkoop_archief_views.xml",
+        "views/bakker_factuur_wachtrij_views.xml",
+        "views/bakker_bijvul_voorstel_views.xml",
+        "views/bakker_verkoop_rapport_views.xml",
+        "views/bakker_verkoop_export_views.xml",
+        "views/bakker_meting_views.xml",
         "reports/bakker_factuur_report.xml",
     ],
     "installable": True,
@@ -0,0 +1,22 @@
+from odoo import http
+from odoo.http import request
+
+from odoo.addons.Bakker.models.bakker_koeken import in_eigen_transactie
+
+
+class BakkerKassaController(http.Controller):
+
+    @http.route('/bakker/kassa/sync', type='json', auth='user', methods=['POST'])
+    def kassa_sync(self, kassa, verkopen):
+        """Synchroniseer de wachtrij van een offline kassa
+
+        Alle verkopen worden in één eigen transactie geboekt, opnieuw bij een conflict
+        met een andere kassa. Een kassa mag een batch veilig opnieuw sturen: verkopen
+        met een bekende sleutel komen terug als ``duplicaat``.
+        """
+        env = request.env
+        return in_eigen_transactie(
+            env.registry,
+            lambda env: env['bakker_verkoop']._verwerk_kassa_batch(str(kassa), verkopen),
+            uid=env.uid, context=env.context,
+        )
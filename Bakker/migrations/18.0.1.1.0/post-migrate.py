@@ -0,0 +1,9 @@
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    """Zet voorraad om naar batches en voeg de oude 'Verse Batch' kopieën samen"""
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    # Vervangen door bakker_koeken_batch_vervallen_idx
+    cr.execute("DROP INDEX IF EXISTS bakker_koeken_vervallen_voorraad_idx")
+    env['bakker_koeken']._migreer_naar_batches()
@@ -0,0 +1,16 @@
+def migrate(cr, version):
+    """Koppel de bestaande walk-in klant aan zijn xml-id, zodat de data file geen tweede aanmaakt
+
+    Vroeger maakte de snelle verkoop de klant zelf aan, zonder xml-id.
+    """
+    cr.execute("""
+        INSERT INTO ir_model_data (module, name, model, res_id, noupdate, create_date, write_date)
+        SELECT 'Bakker', 'partner_walk_in_klant', 'res.partner', p.id, true,
+               now() AT TIME ZONE 'UTC', now() AT TIME ZONE 'UTC'
+          FROM res_partner p
+         WHERE p.name = 'Walk-in klant'
+           AND NOT EXISTS (SELECT 1 FROM ir_model_data
+                            WHERE module = 'Bakker' AND name = 'partner_walk_in_klant')
+      ORDER BY p.active DESC, p.id
+         LIMIT 1
+    """)
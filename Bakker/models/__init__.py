@@ -1,4 +1,13 @@
 from . import bakker_koeken
+from . import bakker_koeken_batch
 from . import bakker_koeken_tags
 from . import bakker_koeken_categorie
 from . import bakker_verkoop
+from . import bakker_verkoop_archief
+from . import bakker_factuur_wachtrij
+from . import bakker_bijvul_voorstel
+from . import bakker_verkoop_rapport
+from . import bakker_verkoop_export
+from . import bakker_koeken_import
+from . import bakker_meting
+from . import bakker_dashboard
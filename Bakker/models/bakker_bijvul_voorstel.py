@@ -0,0 +1,162 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from collections import defaultdict
+from datetime import timedelta
+import logging
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_logger = logging.getLogger(__name__)
+
+
+class BakkerBijvulVoorstel(models.Model):
+    _name = "bakker_bijvul_voorstel"
+    _description = "Voorstel om de voorraad van een koek bij te vullen"
+    _order = "datum desc, aantal desc, id desc"
+    _rec_name = "koek_id"
+
+    # Historiek en parameters van de prognose
+    HISTORIEK_DAGEN = 365
+    ALPHA = 0.1             # gewicht van de meest recente dag bij exponentiële afvlakking
+    SPREIDING_DAGEN = 28    # venster voor de standaardafwijking van de dagelijkse vraag
+    LEVERTIJD_DAGEN = 1     # tijd tussen bijvullen en beschikbaar in de winkel
+    DEKKING_DAGEN = 3       # aantal dagen vraag dat een bijvulling moet dekken
+    SERVICE_Z = 1.65        # ongeveer 95% kans om niet uitverkocht te raken
+
+    koek_id = fields.Many2one('bakker_koeken', string="Koek", required=True, readonly=True, ondelete='cascade', index=True)
+    categorie_koek_id = fields.Many2one(related='koek_id.categorie_koek_id', string="Categorie")
+    datum = fields.Date(string="Datum", required=True, readonly=True, default=fields.Date.today)
+    voorraad = fields.Integer(string="Voorraad", readonly=True, help="Voorraad op het moment van de berekening")
+    verwachte_vraag = fields.Float(string="Verwachte Vraag / Dag", readonly=True, digits=(16, 2))
+    bestelpunt = fields.Integer(string="Bestelpunt", readonly=True)
+    aantal = fields.Integer(string="Voorgesteld Aantal", required=True)
+    status = fields.Selection([
+        ('nieuw', 'Nieuw'),
+        ('toegepast', 'Toegepast')
+    ], string="Status", default='nieuw', required=True, readonly=True, index=True)
+
+    @api.model
+    def _cron_maak_voorstellen(self):
+        """Bereken de prognose voor de hele catalogus en maak nieuwe voorstellen"""
+        if numpy is None:
+            _logger.warning("Bijvulvoorstellen overgeslagen: de Python bibliotheek numpy is niet geïnstalleerd")
+            return
+        self._maak_voorstellen()
+
+    def action_bereken(self):
+        """Herbereken de voorstellen vanuit de lijst"""
+        if numpy is None:
+            raise UserError("Bijvulvoorstellen vereisen de Python bibliotheek numpy.")
+        self._maak_voorstellen()
+        return self.env['ir.actions.act_window']._for_xml_id('Bakker.action_bakker_bijvul_voorstel')
+
+    def action_toepassen(self):
+        """Vul de voorraad bij volgens de geselecteerde voorstellen"""
+        voorstellen = self.filtered(lambda v: v.status == 'nieuw' and v.aantal > 0)
+        aantallen = defaultdict(int)
+        for voorstel in voorstellen:
+            aantallen[voorstel.koek_id.id] += voorstel.aantal
+        self.env['bakker_koeken']._voorraad_bijwerken(aantallen)
+        voorstellen.koek_id.write({'aankoopdatum_koek': fields.Date.today()})
+        voorstellen.write({'status': 'toegepast'})
+        return True
+
+    @api.model
+    def _maak_voorstellen(self):
+        """Vervang de openstaande voorstellen door een nieuwe berekening
+
+        :return: de nieuwe voorstellen
+        """
+        koek_ids, vraag, spreiding = self._bereken_prognose()
+        Koeken = self.env['bakker_koeken']
+        Koeken.flush_model(['voorraad_koek', 'bestelpunt'])
+
+        # Koeken zonder historiek in de periode krijgen weer het standaard bestelpunt,
+        # anders blijft het bestelpunt van hun laatste verkopen staan
+        standaard = Koeken.default_get(['bestelpunt'])['bestelpunt']
+        self.env.cr.execute("""
+            UPDATE bakker_koeken
+               SET bestelpunt = %s
+             WHERE id != ALL(%s) AND bestelpunt IS DISTINCT FROM %s
+        """, [standaard, koek_ids.tolist(), standaard])
+        Koeken.invalidate_model(['bestelpunt'])
+        if not len(koek_ids):
+            self.search([('status', '=', 'nieuw')]).unlink()
+            return self.browse()
+
+        veiligheid = self.SERVICE_Z * spreiding * math.sqrt(self.LEVERTIJD_DAGEN)
+        bestelpunt = numpy.ceil(vraag * self.LEVERTIJD_DAGEN + veiligheid).astype(int)
+        doelvoorraad = numpy.ceil(vraag * (self.LEVERTIJD_DAGEN + self.DEKKING_DAGEN) + veiligheid).astype(int)
+
+        # Huidige voorraad in dezelfde volgorde als koek_ids, verwijderde koeken vallen weg
+        self.env.cr.execute(
+            "SELECT id, voorraad_koek FROM bakker_koeken WHERE id = ANY(%s)", [koek_ids.tolist()],
+        )
+        bestaand = numpy.array(self.env.cr.fetchall(), dtype=numpy.int64).reshape(-1, 2)
+        posities = numpy.searchsorted(koek_ids, bestaand[:, 0])
+        koek_ids, vraag, bestelpunt, doelvoorraad = (
+            koek_ids[posities], vraag[posities], bestelpunt[posities], doelvoorraad[posities],
+        )
+        voorraad = bestaand[:, 1]
+
+        # Bestelpunten van alle koeken met historiek in één UPDATE
+        self.env.cr.execute("""
+            UPDATE bakker_koeken k
+               SET bestelpunt = d.bestelpunt
+              FROM unnest(%s::int[], %s::int[]) AS d(id, bestelpunt)
+             WHERE k.id = d.id AND k.bestelpunt IS DISTINCT FROM d.bestelpunt
+        """, [koek_ids.tolist(), bestelpunt.tolist()])
+        Koeken.browse(koek_ids.tolist()).invalidate_recordset(['bestelpunt'])
+
+        bijvullen = (voorraad <= bestelpunt) & (doelvoorraad > voorraad)
+        self.search([('status', '=', 'nieuw')]).unlink()
+        voorstellen = self.create([{
+            'koek_id': koek_id,
+            'voorraad': stock,
+            'verwachte_vraag': verwacht,
+            'bestelpunt': punt,
+            'aantal': doel - stock,
+        } for koek_id, stock, verwacht, punt, doel in zip(
+            koek_ids[bijvullen].tolist(), voorraad[bijvullen].tolist(), vraag[bijvullen].tolist(),
+            bestelpunt[bijvullen].tolist(), doelvoorraad[bijvullen].tolist(),
+        )])
+        _logger.info("Bijvulprognose: %s koeken berekend, %s voorstellen", len(koek_ids), len(voorstellen))
+        return voorstellen
+
+    @api.model
+    def _bereken_prognose(self):
+        """Verwachte dagelijkse vraag per koek uit de verkoophistoriek
+
+        Eén gegroepeerde query levert een matrix koeken x dagen; de prognose is
+        een exponentieel gewogen gemiddelde over de dagen, voor alle koeken tegelijk.
+
+        :return: (koek_ids, vraag, spreiding) als numpy arrays, gesorteerd op koek_id
+        """
+        dagen = self.HISTORIEK_DAGEN
+        vandaag = fields.Date.context_today(self)
+        start = vandaag - timedelta(days=dagen)
+        self.env['bakker_verkoop'].flush_model(['koek_id', 'verkoop_datum', 'aantal', 'status'])
+        self.env.cr.execute("""
+            SELECT koek_id, verkoop_datum::date - %s::date, SUM(aantal)
+              FROM bakker_verkoop
+             WHERE status IN ('bevestigd', 'betaald')
+               AND verkoop_datum >= %s AND verkoop_datum < %s
+          GROUP BY koek_id, verkoop_datum::date
+        """, [start, start, vandaag])
+        rijen = numpy.array(self.env.cr.fetchall(), dtype=numpy.int64).reshape(-1, 3)
+        if not len(rijen):
+            return numpy.empty(0, dtype=numpy.int64), numpy.empty(0), numpy.empty(0)
+
+        koek_ids, rij_index = numpy.unique(rijen[:, 0], return_inverse=True)
+        matrix = numpy.zeros((len(koek_ids), dagen))
+        matrix[rij_index, rijen[:, 1]] = rijen[:, 2]
+
+        # Gewicht alpha * (1 - alpha)^leeftijd, genormaliseerd over het venster
+        gewichten = self.ALPHA * (1 - self.ALPHA) ** numpy.arange(dagen)[::-1]
+        vraag = matrix @ (gewichten / gewichten.sum())
+        spreiding = matrix[:, -self.SPREIDING_DAGEN:].std(axis=1)
+        return koek_ids, vraag, spreiding
@@ -0,0 +1,88 @@
+from odoo import models, fields, api, tools
+from datetime import datetime, time
+
+
+class BakkerDashboard(models.AbstractModel):
+    _name = "bakker_dashboard"
+    _description = "Samenvatting per categorie voor het winkel dashboard"
+
+    @api.model
+    def _snapshot(self):
+        """Cijfers per categorie: {categorie_id: {voorraad_waarde, aantal_laag, aantal_vervallen, omzet_vandaag}}
+
+        De snapshot wordt per worker gecached. De sleutel bevat de laatste write_date
+        en het hoogste id van koeken en verkopen, zodat elke wijziging hem ongeldig
+        maakt met één goedkope query op de indexen. Verwijderde rijen verhogen een
+        sequence, die zonder te tellen gelezen wordt. Transacties die later committen
+        dan ze begonnen zijn vallen binnen de minuut in de sleutel.
+        """
+        self.env['bakker_koeken'].flush_model()
+        self.env['bakker_verkoop'].flush_model()
+        self.env.cr.execute("""
+            SELECT (SELECT MAX(write_date) FROM bakker_koeken),
+                   (SELECT MAX(id) FROM bakker_koeken),
+                   (SELECT MAX(write_date) FROM bakker_verkoop),
+                   (SELECT MAX(id) FROM bakker_verkoop),
+                   (SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM bakker_dashboard_verwijderd_seq),
+                   date_trunc('minute', now() AT TIME ZONE 'UTC')
+        """)
+        sleutel = tuple(self.env.cr.fetchone())
+        return self._bereken_snapshot(sleutel)
+
+    @api.model
+    def _markeer_verwijderd(self):
+        """Maak de snapshot ongeldig na het verwijderen van koeken of verkopen
+
+        nextval is niet transactioneel: een worker die de snapshot tussen nextval en de
+        commit berekent, cachet de oude cijfers hooguit tot de volgende minuut.
+        """
+        self.env.cr.execute("SELECT nextval('bakker_dashboard_verwijderd_seq')")
+
+    def init(self):
+        # Verwijderde rijen laten geen spoor na in MAX(write_date) of MAX(id)
+        self.env.cr.execute("CREATE SEQUENCE IF NOT EXISTS bakker_dashboard_verwijderd_seq")
+
+    @api.model
+    @tools.ormcache('sleutel')
+    def _bereken_snapshot(self, sleutel):
+        vandaag = fields.Date.today()
+        snapshot = {}
+        self.env.cr.execute("""
+            SELECT categorie_koek_id,
+                   SUM(totaal_inventarisatie),
+                   COUNT(*) FILTER (WHERE voorraad_koek <= bestelpunt),
+                   COUNT(*) FILTER (WHERE vervaldatum_koek < %s AND voorraad_koek > 0)
+              FROM bakker_koeken
+          GROUP BY categorie_koek_id
+        """, [vandaag])
+        for categorie_id, waarde, laag, vervallen in self.env.cr.fetchall():
+            snapshot[categorie_id] = {
+                'voorraad_waarde': waarde or 0.0,
+                'aantal_laag': laag,
+                'aantal_vervallen': vervallen,
+                'omzet_vandaag': 0.0,
+            }
+
+        # Gebruikt de index op verkoop_datum, enkel de verkopen van vandaag worden gelezen
+        self.env.cr.execute("""
+            SELECT k.categorie_koek_id, SUM(v.totaal_bedrag)
+              FROM bakker_verkoop v
+              JOIN bakker_koeken k ON k.id = v.koek_id
+             WHERE v.verkoop_datum >= %s AND v.status = 'betaald'
+          GROUP BY k.categorie_koek_id
+        """, [datetime.combine(vandaag, time.min)])
+        for categorie_id, omzet in self.env.cr.fetchall():
+            if categorie_id in snapshot:
+                snapshot[categorie_id]['omzet_vandaag'] = omzet or 0.0
+        return snapshot
+
+    @api.model
+    def _groep_label(self, naam, cijfers):
+        """Titel van een kanban kolom met de cijfers van de categorie"""
+        delen = [naam, f"€{cijfers['voorraad_waarde']:,.0f}"]
+        if cijfers['aantal_laag']:
+            delen.append(f"⚠️ {cijfers['aantal_laag']} laag")
+        if cijfers['aantal_vervallen']:
+            delen.append(f"❌ {cijfers['aantal_vervallen']} vervallen")
+        delen.append(f"💰 €{cijfers['omzet_vandaag']:,.2f} vandaag")
+        return " · ".join(delen)
@@ -0,0 +1,117 @@
+from odoo import models, fields, api
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class BakkerFactuurWachtrij(models.Model):
+    _name = "bakker_factuur_wachtrij"
+    _description = "Wachtrij voor factuur emails"
+    _order = "volgende_poging asc, id asc"
+
+    MAX_POGINGEN = 5
+
+    verkoop_id = fields.Many2one('bakker_verkoop', string="Verkoop", required=True, ondelete='cascade')
+    status = fields.Selection([
+        ('wachtend', 'Wachtend'),
+        ('verstuurd', 'Verstuurd'),
+        ('fout', 'Fout')
+    ], string="Status", default='wachtend', required=True, index=True)
+    pogingen = fields.Integer(string="Pogingen", default=0)
+    volgende_poging = fields.Datetime(string="Volgende Poging", default=fields.Datetime.now, index=True)
+    foutmelding = fields.Text(string="Foutmelding")
+    # De mail wordt één keer gerenderd, een nieuwe poging verstuurt dezelfde mail opnieuw
+    mail_id = fields.Many2one('mail.mail', string="Email", readonly=True, ondelete='set null')
+
+    @api.model
+    def _cron_verstuur_facturen(self, batch_size=100):
+        """Verstuur wachtende factuur emails in batches"""
+        template = self.env.ref('Bakker.email_template_bakker_factuur', raise_if_not_found=False)
+        if not template:
+            return
+
+        while True:
+            wachtrij = self.search([
+                ('status', '=', 'wachtend'),
+                ('volgende_poging', '<=', fields.Datetime.now()),
+            ], limit=batch_size)
+            if not wachtrij:
+                break
+            wachtrij._verstuur_batch(template)
+            # Commit per batch zodat een fout later de verstuurde mails niet terugdraait
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+
+    def _verstuur_batch(self, template):
+        """Render en verstuur één batch over één SMTP verbinding"""
+        # Mislukte mails van een vorige poging opnieuw versturen, enkel de rest renderen
+        opnieuw = self.mail_id.exists()
+        opnieuw.filtered(lambda mail: mail.state == 'exception').write({'state': 'outgoing', 'failure_reason': False})
+        nieuw = self.filtered(lambda item: not item.mail_id.exists())
+        mislukt = nieuw._render_mails(template) if nieuw else {}
+        mails = self.mail_id
+        # mail.mail.send() opent één SMTP verbinding per mailserver voor de hele batch
+        mails.filtered(lambda mail: mail.state == 'outgoing').send(auto_commit=False, raise_exception=False)
+
+        mislukt.update({mail.res_id: mail.failure_reason for mail in mails.exists() if mail.state == 'exception'})
+        gelukt = self.filtered(lambda item: item.verkoop_id.id not in mislukt)
+        gelukt.write({'status': 'verstuurd', 'foutmelding': False})
+
+        for item in self - gelukt:
+            item._plan_nieuwe_poging(mislukt[item.verkoop_id.id])
+
+        # Audit log in bulk op de verkopen
+        if gelukt:
+            gelukt.verkoop_id._message_log_batch(
+                bodies={verkoop.id: f"Factuur email verstuurd naar {verkoop.partner_id.email}" for verkoop in gelukt.verkoop_id},
+                subject="Factuur Email Verstuurd",
+            )
+        geen_pogingen_meer = self.filtered(lambda item: item.status == 'fout')
+        if geen_pogingen_meer:
+            geen_pogingen_meer.verkoop_id._message_log_batch(
+                bodies={item.verkoop_id.id: f"Fout bij versturen email: {item.foutmelding}" for item in geen_pogingen_meer},
+                subject="Email Fout",
+            )
+
+    def _render_mails(self, template):
+        """Render de mails in één keer, per item opnieuw als de batch niet lukt
+
+        :return: {verkoop_id: foutmelding} van de items die niet gerenderd konden worden
+        """
+        fouten = {}
+        try:
+            with self.env.cr.savepoint():
+                mails = template.send_mail_batch(self.verkoop_id.ids, force_send=False)
+        except Exception:
+            # Eén verkoop die niet rendert mag de rest van de wachtrij niet tegenhouden
+            mails = self.env['mail.mail']
+            for item in self:
+                try:
+                    with self.env.cr.savepoint():
+                        mails |= template.send_mail_batch(item.verkoop_id.ids, force_send=False)
+                except Exception as e:
+                    _logger.warning("Factuur email voor %s kon niet gerenderd worden: %s", item.verkoop_id.name, e)
+                    fouten[item.verkoop_id.id] = f"Renderen mislukt: {e}"
+        mail_per_verkoop = {mail.res_id: mail.id for mail in mails}
+        for item in self:
+            if item.verkoop_id.id in mail_per_verkoop:
+                item.mail_id = mail_per_verkoop[item.verkoop_id.id]
+        return fouten
+
+    def _plan_nieuwe_poging(self, foutmelding):
+        """Plan een nieuwe poging met exponentiële backoff"""
+        self.ensure_one()
+        pogingen = self.pogingen + 1
+        vals = {'pogingen': pogingen, 'foutmelding': foutmelding}
+        if pogingen >= self.MAX_POGINGEN:
+            vals['status'] = 'fout'
+            _logger.warning("Factuur email voor %s definitief mislukt: %s", self.verkoop_id.name, foutmelding)
+        else:
+            vals['volgende_poging'] = fields.Datetime.now() + timedelta(minutes=2 ** pogingen)
+        self.write(vals)
+
+    def action_opnieuw_proberen(self):
+        """Zet mislukte emails terug in de wachtrij"""
+        self.write({'status': 'wachtend', 'pogingen': 0, 'volgende_poging': fields.Datetime.now()})
+        return True
@@ -1,39 +1,191 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, SUPERUSER_ID
+from collections import defaultdict
 from datetime import timedelta
-from odoo.exceptions import ValidationError
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools import SQL, float_compare
+from odoo.tools.sql import create_index
+from .bakker_meting import gemeten
+import logging
+import psycopg2
+from psycopg2 import errors
+import random
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Naam van de kopieën die action_verse_batch vroeger maakte
+VERSE_BATCH_SUFFIX = " - Verse Batch"
+
+# Fouten waarbij een nieuwe transactie kan slagen waar de vorige faalde
+CONFLICT_FOUTEN = (
+    errors.SerializationFailure,
+    errors.DeadlockDetected,
+    errors.LockNotAvailable,
+)
+MAX_POGINGEN = 5
+
+
+def in_eigen_transactie(registry, functie, uid=SUPERUSER_ID, context=None):
+    """Voer ``functie(env)`` uit in een eigen transactie, opnieuw bij een conflict
+
+    Odoo cursors draaien op REPEATABLE READ: een koek die een andere kassa na het
+    begin van de transactie verkocht kan niet meer gelockt worden (40001). Deze
+    transactie draait op READ COMMITTED, zodat een lock wacht en daarna de laatste
+    voorraad ziet. Deadlocks en resterende conflicten worden herhaald met backoff.
+
+    :return: het resultaat van ``functie``, na de commit
+    """
+    for poging in range(1, MAX_POGINGEN + 1):
+        try:
+            with registry.cursor() as cr:
+                # In test mode delen alle cursors de transactie van de test
+                if not registry.in_test_mode():
+                    cr.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+                return functie(api.Environment(cr, uid, context or {}))
+        except CONFLICT_FOUTEN as e:
+            if poging == MAX_POGINGEN:
+                raise
+            _logger.info("Conflict bij poging %s, opnieuw: %s", poging, e.pgcode)
+            time.sleep(random.uniform(0, 0.05 * 2 ** poging))
+
 
 class BakkerKoeken(models.Model):
     _name = "bakker_koeken"
     _description = "Bakker zijn lekkere koeken"
     _order = "name_koek asc"
 
-    name_koek = fields.Char(string="Naam van de koek", required=True, help="Vul hier de naam van de koek in")
+    name_koek = fields.Char(string="Naam van de koek", required=True, index='trigram', help="Vul hier de naam van de koek in")
     prijs_koek = fields.Float(string="Prijs van de koek", required=True, help="Vul hier de prijs van de koek in")
     voorraad_koek = fields.Integer(string="Voorraad van de koek", required=True , default=10)
-    vervaldatum_koek = fields.Date(string="Vervaldatum van de koek", required=True, help="Vul hier de vervaldatum van de koek in", default=lambda self: fields.Date.today() + timedelta(days=30), readonly=True)
+    vervaldatum_koek = fields.Date(string="Vervaldatum van de koek", required=True, help="Vul hier de vervaldatum van de koek in", default=lambda self: fields.Date.today() + timedelta(days=30), readonly=True, index=True)
     aankoopdatum_koek = fields.Date(string="Aankoopdatum van de koek", default=fields.Date.today, help="Vul hier de aankoopdatum van de koek in", readonly=True)
-    categorie_koek_id = fields.Many2one('bakker_koeken_categorie', string="Categorie van de koek", required=True, help="Selecteer hier de categorie van de koek")
+    categorie_koek_id = fields.Many2one('bakker_koeken_categorie', string="Categorie van de koek", required=True, index=True, help="Selecteer hier de categorie van de koek")
     pudding_koek = fields.Boolean(string="Bevat pudding", default=False, help="Vink dit aan als de koek pudding bevat")
     totaal_inventarisatie = fields.Float(string="Totale inventarisatie waarde", compute="_compute_totaal_inventarisatie", store=True, inverse="_inverse_totaal_inventarisatie", help="Totale waarde van de koek in inventarisatie (prijs * voorraad)")
     tags_ids = fields.Many2many('bakker_koeken_tags', string="Tags", help="Selecteer hier de tags voor de koek")
+    # voorraad_koek is de som van de resterende aantallen van deze batches
+    batch_ids = fields.One2many('bakker_koeken_batch', 'koek_id', string="Batches", domain=[('resterend', '>', 0)])
     
     # Nieuwe verkoop gerelateerde velden
     verkoop_ids = fields.One2many('bakker_verkoop', 'koek_id', string='Verkopen')
-    totaal_verkocht = fields.Integer(string='Totaal Verkocht', compute='_compute_verkoop_stats', store=True)
-    totaal_omzet = fields.Float(string='Totaal Omzet', compute='_compute_verkoop_stats', store=True)
-    verkoop_count = fields.Integer(string='Aantal Verkopen', compute='_compute_verkoop_count')
     
-    @api.depends('verkoop_ids.aantal', 'verkoop_ids.totaal_bedrag', 'verkoop_ids.status')
-    def _compute_verkoop_stats(self):
-        for record in self:
-            betaalde_verkopen = record.verkoop_ids.filtered(lambda v: v.status == 'betaald')
-            record.totaal_verkocht = sum(betaalde_verkopen.mapped('aantal'))
-            record.totaal_omzet = sum(betaalde_verkopen.mapped('totaal_bedrag'))
+    # Worden incrementeel bijgehouden door bakker_verkoop, zie _verwerk_verkoop_delta
+    totaal_verkocht = fields.Integer(string='Totaal Verkocht', readonly=True, default=0)
+    totaal_omzet = fields.Float(string='Totaal Omzet', readonly=True, default=0.0)
+    verkoop_count = fields.Integer(string='Recente Verkopen', compute='_compute_verkoop_count', help="Aantal verkopen die nog niet gearchiveerd zijn")
+    # Wordt dagelijks uit de verkoophistoriek berekend, zie bakker_bijvul_voorstel
+    bestelpunt = fields.Integer(string='Bestelpunt', default=10, readonly=True, help="Voorraad waaronder de koek bijgevuld moet worden")
+    onder_bestelpunt = fields.Boolean(string='Onder Bestelpunt', compute='_compute_onder_bestelpunt', search='_search_onder_bestelpunt')
+    
+    @api.model_create_multi
+    def create(self, vals_list):
+        koeken = super().create(vals_list)
+        # Startvoorraad als eerste batch
+        self.env['bakker_koeken_batch'].create([{
+            'koek_id': koek.id,
+            'aantal': koek.voorraad_koek,
+            'resterend': koek.voorraad_koek,
+            'productiedatum': koek.aankoopdatum_koek or fields.Date.today(),
+            'vervaldatum': koek.vervaldatum_koek,
+        } for koek in koeken if koek.voorraad_koek > 0])
+        return koeken
+    
+    def write(self, vals):
+        if 'voorraad_koek' not in vals:
+            res = super().write(vals)
+        else:
+            oude_voorraad = {record.id: record.voorraad_koek for record in self}
+            res = super().write(vals)
+            self.env['bakker_koeken_batch']._pas_batches_aan({
+                record.id: record.voorraad_koek - oude_voorraad[record.id] for record in self
+            })
+        if 'categorie_koek_id' in vals or 'tags_ids' in vals:
+            # Het rapport groepeert per koek, de verkopen zelf veranderen niet
+            self.env['bakker_verkoop_rapport'].sudo()._ververs_koeken(self.ids)
+        return res
+    
+    def unlink(self):
+        res = super().unlink()
+        self.env['bakker_dashboard']._markeer_verwijderd()
+        return res
+    
+    @api.model
+    @api.readonly
+    def web_read_group(self, domain, fields, groupby, *args, **kwargs):
+        """Toon de dashboard cijfers van de categorie in de kolomtitels van de kanban"""
+        result = super().web_read_group(domain, fields, groupby, *args, **kwargs)
+        if self.env.context.get('bakker_dashboard') and groupby and groupby[0] == 'categorie_koek_id':
+            Dashboard = self.env['bakker_dashboard']
+            snapshot = Dashboard._snapshot()
+            for groep in result['groups']:
+                categorie = groep.get('categorie_koek_id')
+                if categorie and categorie[0] in snapshot:
+                    groep['categorie_koek_id'] = (categorie[0], Dashboard._groep_label(categorie[1], snapshot[categorie[0]]))
+        return result
+    
+    def _verwerk_verkoop_delta(self, deltas):
+        """Tel verschillen {koek_id: (aantal, omzet)} op bij de verkoop statistieken"""
+        deltas = {koek_id: delta for koek_id, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+        self.flush_model(['totaal_verkocht', 'totaal_omzet'])
+        koek_ids = list(deltas)
+        self.env.cr.execute("""
+            UPDATE bakker_koeken k
+               SET totaal_verkocht = COALESCE(k.totaal_verkocht, 0) + d.aantal,
+                   totaal_omzet = COALESCE(k.totaal_omzet, 0) + d.omzet
+              FROM unnest(%s::int[], %s::int[], %s::float8[]) AS d(id, aantal, omzet)
+             WHERE k.id = d.id
+        """, [koek_ids, [deltas[k][0] for k in koek_ids], [deltas[k][1] for k in koek_ids]])
+        self.browse(koek_ids).invalidate_recordset(['totaal_verkocht', 'totaal_omzet'])
+    
+    @api.model
+    def _cron_reconcilieer_verkoop_stats(self):
+        """Herbereken de verkoop statistieken met één GROUP BY en meld afwijkingen"""
+        self.env['bakker_verkoop'].flush_model(['koek_id', 'aantal', 'totaal_bedrag', 'status'])
+        self.flush_model(['totaal_verkocht', 'totaal_omzet'])
+        self.env.cr.execute("""
+            SELECT k.id, COALESCE(k.totaal_verkocht, 0), COALESCE(k.totaal_omzet, 0),
+                   COALESCE(SUM(v.aantal), 0), COALESCE(SUM(v.totaal_bedrag), 0)
+              FROM bakker_koeken k
+         LEFT JOIN (SELECT koek_id, aantal, totaal_bedrag FROM bakker_verkoop WHERE status = 'betaald'
+                     UNION ALL
+                    -- Gearchiveerde verkopen tellen mee in de statistieken
+                    SELECT koek_id, aantal, totaal_bedrag FROM bakker_verkoop_archief WHERE status = 'betaald') v
+                ON v.koek_id = k.id
+          GROUP BY k.id
+        """)
+        deltas = {}
+        for koek_id, verkocht, omzet, echt_verkocht, echte_omzet in self.env.cr.fetchall():
+            if verkocht != echt_verkocht or float_compare(omzet, echte_omzet, precision_digits=2):
+                _logger.warning(
+                    "Verkoop statistieken van koek %s wijken af: verkocht %s != %s, omzet %s != %s",
+                    koek_id, verkocht, echt_verkocht, omzet, echte_omzet,
+                )
+                deltas[koek_id] = (echt_verkocht - verkocht, echte_omzet - omzet)
+        self._verwerk_verkoop_delta(deltas)
+        return len(deltas)
     
     @api.depends('verkoop_ids')
     def _compute_verkoop_count(self):
+        # Tel de niet gearchiveerde verkopen van alle zichtbare koeken met één GROUP BY
+        tellingen = dict(self.env['bakker_verkoop']._read_group(
+            [('koek_id', 'in', self._origin.ids)], ['koek_id'], ['__count'],
+        ))
+        for record in self:
+            record.verkoop_count = tellingen.get(record._origin, 0)
+    
+    @api.depends('voorraad_koek', 'bestelpunt')
+    def _compute_onder_bestelpunt(self):
         for record in self:
-            record.verkoop_count = len(record.verkoop_ids)
+            record.onder_bestelpunt = record.voorraad_koek <= record.bestelpunt
+    
+    def _search_onder_bestelpunt(self, operator, value):
+        if operator not in ('=', '!=') or not isinstance(value, bool):
+            raise UserError("Niet ondersteunde zoekopdracht op Onder Bestelpunt.")
+        # Vergelijking tussen twee kolommen kan niet in een gewoon domein
+        onder = SQL("SELECT id FROM bakker_koeken WHERE voorraad_koek <= bestelpunt")
+        return [('id', 'in' if (operator == '=') == value else 'not in', onder)]
     
     @api.onchange('prijs_koek', 'voorraad_koek')
     def _onchange_prijs_koek(self):
@@ -63,48 +215,367 @@ class BakkerKoeken(models.Model):
             if record.prijs_koek < 0:
                 raise ValidationError("Prijs van de koek kan niet negatief zijn.")
         
+    def init(self):
+        # pg_trgm is nodig voor de trigram indexen op name_koek en de categorie naam
+        if not self.pool.has_trigram:
+            try:
+                with self.env.cr.savepoint():
+                    self.env.cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                self.pool.has_trigram = True
+            except psycopg2.Error:
+                _logger.warning("pg_trgm kon niet geïnstalleerd worden, zoeken op naam gebeurt zonder trigram index")
+        # Sleutel van de dashboard snapshot, zie bakker_dashboard
+        create_index(self.env.cr, 'bakker_koeken_write_date_idx', self._table, ['write_date'])
+    
+    @api.model
+    def _voorraad_bijwerken(self, wijzigingen, absoluut=False, productiedatum=None, vervaldatum=None, terugzetten=False):
+        """Pas de voorraad van veel koeken aan met één UPDATE
+
+        :param wijzigingen: {koek_id: aantal}, op te tellen bij de voorraad of
+            als nieuwe voorraad indien ``absoluut``
+        :param productiedatum: productiedatum van de nieuwe batches bij bijvullen
+        :param vervaldatum: vervaldatum van de nieuwe batches bij bijvullen
+        :param terugzetten: meer voorraad gaat terug naar de laatst verbruikte
+            batches in plaats van naar een nieuwe batch
+        :return: {koek_id: nieuwe voorraad}
+        """
+        if not wijzigingen:
+            return {}
+        self.flush_model(['voorraad_koek', 'prijs_koek', 'totaal_inventarisatie'])
+        oude_voorraad = self._lock_koeken(wijzigingen)
+        koek_ids = list(oude_voorraad)
+        nieuwe_voorraad = "d.aantal" if absoluut else "k.voorraad_koek + d.aantal"
+        self.env.cr.execute(f"""
+            UPDATE bakker_koeken k
+               SET voorraad_koek = {nieuwe_voorraad},
+                   totaal_inventarisatie = k.prijs_koek * ({nieuwe_voorraad}),
+                   write_uid = %s,
+                   write_date = now() AT TIME ZONE 'UTC'
+              FROM unnest(%s::int[], %s::int[]) AS d(id, aantal)
+             WHERE k.id = d.id
+         RETURNING k.id, k.voorraad_koek
+        """, [self.env.uid, koek_ids, [wijzigingen[koek_id] for koek_id in koek_ids]])
+        resultaat = dict(self.env.cr.fetchall())
+        self.browse(koek_ids).invalidate_recordset(['voorraad_koek', 'totaal_inventarisatie', 'write_uid', 'write_date'])
+        
+        # Zelfde controle als _check_non_negative, die bij SQL niet automatisch loopt
+        if any(voorraad < 0 for voorraad in resultaat.values()):
+            raise ValidationError("Voorraad van de koek kan niet negatief zijn.")
+        
+        self.env['bakker_koeken_batch']._pas_batches_aan({
+            koek_id: voorraad - oude_voorraad[koek_id] for koek_id, voorraad in resultaat.items()
+        }, productiedatum=productiedatum, vervaldatum=vervaldatum, terugzetten=terugzetten)
+        return resultaat
+    
+    @api.model
+    def _lock_koeken(self, koek_ids):
+        """Lock de koeken in vaste id volgorde, zodat parallelle kassa's niet deadlocken
+
+        :return: {koek_id: huidige voorraad}, gesorteerd op id
+        """
+        self.env.cr.execute(
+            "SELECT id, voorraad_koek FROM bakker_koeken WHERE id = ANY(%s) ORDER BY id FOR NO KEY UPDATE",
+            [sorted(koek_ids)],
+        )
+        return dict(self.env.cr.fetchall())
+    
+    @api.model
+    def _reserveer_voorraad(self, aanvragen):
+        """Haal {koek_id: aantal} atomair van de voorraad, alles of niets
+
+        De voorraad wordt in de UPDATE zelf gecontroleerd, zodat twee kassa's
+        die tegelijk dezelfde koek verkopen nooit meer verkopen dan er is.
+        Onder REPEATABLE READ geeft een gelijktijdige verkoop van dezelfde koek
+        een serialisatie fout: Odoo herhaalt dan de hele request, kassa's en
+        andere code buiten een request gebruiken ``in_eigen_transactie``.
+        """
+        aanvragen = {koek_id: aantal for koek_id, aantal in aanvragen.items() if aantal}
+        if not aanvragen:
+            return {}
+        self.flush_model(['voorraad_koek', 'prijs_koek', 'totaal_inventarisatie'])
+        koek_ids = list(self._lock_koeken(aanvragen))
+        self.env.cr.execute("""
+            UPDATE bakker_koeken k
+               SET voorraad_koek = k.voorraad_koek - d.aantal,
+                   totaal_inventarisatie = k.prijs_koek * (k.voorraad_koek - d.aantal),
+                   write_uid = %s,
+                   write_date = now() AT TIME ZONE 'UTC'
+              FROM unnest(%s::int[], %s::int[]) AS d(id, aantal)
+             WHERE k.id = d.id
+               AND k.voorraad_koek >= d.aantal
+         RETURNING k.id, k.voorraad_koek
+        """, [self.env.uid, koek_ids, [aanvragen[koek_id] for koek_id in koek_ids]])
+        resultaat = dict(self.env.cr.fetchall())
+        koeken = self.browse(koek_ids)
+        koeken.invalidate_recordset(['voorraad_koek', 'totaal_inventarisatie', 'write_uid', 'write_date'])
+        
+        tekort = koeken.filtered(lambda koek: koek.id not in resultaat)
+        if tekort:
+            # De exception draait ook de al gereserveerde koeken terug
+            raise ValidationError("Niet genoeg voorraad voor %s! Beschikbaar: %s" % (
+                ", ".join(tekort.mapped('name_koek')),
+                ", ".join(str(voorraad) for voorraad in tekort.mapped('voorraad_koek')),
+            ))
+        
+        self.env['bakker_koeken_batch']._pas_batches_aan({koek_id: -aantal for koek_id, aantal in aanvragen.items()})
+        return resultaat
+    
+    @api.model
+    def _geef_voorraad_vrij(self, vrijgaven):
+        """Zet een eerder gereserveerde {koek_id: aantal} terug op voorraad, in de batches waar het vandaan kwam"""
+        return self._voorraad_bijwerken(
+            {koek_id: aantal for koek_id, aantal in vrijgaven.items() if aantal}, terugzetten=True,
+        )
+    
+    @api.model
+    def _cron_schrijf_vervallen_af(self, batch_size=1000):
+        """Schrijf de vervallen batches af, in stukken met een commit ertussen"""
+        vandaag = fields.Date.context_today(self)
+        afgeschreven = 0
+        conflicten = 0
+        while True:
+            self.env.cr.execute("""
+                SELECT DISTINCT koek_id
+                  FROM bakker_koeken_batch
+                 WHERE vervaldatum < %s AND resterend > 0
+                 LIMIT %s
+            """, [vandaag, batch_size])
+            koek_ids = [koek_id for koek_id, in self.env.cr.fetchall()]
+            if not koek_ids:
+                break
+            try:
+                # Eerst locken, dan pas lezen: een kassa kan intussen uit dezelfde batches verkocht hebben
+                self.flush_model(['voorraad_koek'])
+                self._lock_koeken(koek_ids)
+                self.env.cr.execute("""
+                    SELECT koek_id, SUM(resterend)
+                      FROM bakker_koeken_batch
+                     WHERE koek_id = ANY(%s) AND vervaldatum < %s AND resterend > 0
+                  GROUP BY koek_id
+                """, [koek_ids, vandaag])
+                vervallen = dict(self.env.cr.fetchall())
+                # FIFO verbruikt de vroegst vervallen batches eerst
+                self._voorraad_bijwerken({koek_id: -aantal for koek_id, aantal in vervallen.items()})
+            except CONFLICT_FOUTEN:
+                # Een kassa wijzigde een koek na het begin van deze transactie, opnieuw met een verse snapshot
+                conflicten += 1
+                if self.env.registry.in_test_mode() or conflicten >= MAX_POGINGEN:
+                    raise
+                self.env.cr.rollback()
+                continue
+            afgeschreven += sum(vervallen.values())
+            # Korte transacties, zodat de kassa's niet op de locks moeten wachten
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+        if afgeschreven:
+            _logger.info("%s vervallen koeken afgeschreven", afgeschreven)
+        return afgeschreven
+    
+    @api.model
+    def _migreer_naar_batches(self):
+        """Zet bestaande voorraad om naar batches en voeg 'Verse Batch' kopieën samen
+
+        Vroeger maakte action_verse_batch een kopie van de koek per batch. Die
+        kopieën worden batches van de originele koek, met hun verkopen, tags en
+        statistieken, en daarna verwijderd.
+        """
+        Batch = self.env['bakker_koeken_batch']
+        koeken = self.with_context(active_test=False).search([], order='id')
+        
+        # Openingsbatch voor voorraad die nog niet in een batch zit
+        in_batches = dict(Batch._read_group(
+            [('koek_id', 'in', koeken.ids), ('resterend', '>', 0)], ['koek_id'], ['resterend:sum'],
+        ))
+        Batch.create([{
+            'koek_id': koek.id,
+            'aantal': koek.voorraad_koek - in_batches.get(koek, 0),
+            'resterend': koek.voorraad_koek - in_batches.get(koek, 0),
+            'productiedatum': koek.aankoopdatum_koek or fields.Date.today(),
+            'vervaldatum': koek.vervaldatum_koek,
+        } for koek in koeken if koek.voorraad_koek > in_batches.get(koek, 0)])
+        Batch.flush_model()
+        
+        # Enkel 'Verse Batch' kopieën worden samengevoegd, koeken die toevallig
+        # dezelfde naam hebben blijven apart bestaan
+        originelen = {}
+        klonen = defaultdict(lambda: self.browse())
+        for koek in koeken:
+            naam = koek.name_koek
+            if not naam.endswith(VERSE_BATCH_SUFFIX):
+                originelen.setdefault(naam, koek)
+                continue
+            while naam.endswith(VERSE_BATCH_SUFFIX):
+                naam = naam[:-len(VERSE_BATCH_SUFFIX)]
+            klonen[naam] |= koek
+        
+        # Een kopie zonder origineel wordt zelf het origineel
+        for naam, kopieen in klonen.items():
+            if naam not in originelen:
+                originelen[naam] = kopieen[0]
+                kopieen[0].name_koek = naam
+                klonen[naam] = kopieen[1:]
+        
+        samengevoegd = self.browse()
+        cr = self.env.cr
+        for naam, kopieen in klonen.items():
+            if not kopieen:
+                continue
+            origineel = originelen[naam]
+            self.flush_model()
+            self.env['bakker_verkoop'].flush_model()
+            cr.execute("UPDATE bakker_koeken_batch SET koek_id = %s WHERE koek_id = ANY(%s)", [origineel.id, kopieen.ids])
+            cr.execute("UPDATE bakker_verkoop SET koek_id = %s WHERE koek_id = ANY(%s)", [origineel.id, kopieen.ids])
+            cr.execute("""
+                UPDATE bakker_koeken
+                   SET voorraad_koek = voorraad_koek + %s,
+                       totaal_inventarisatie = prijs_koek * (voorraad_koek + %s)
+                 WHERE id = %s
+            """, [sum(kopieen.mapped('voorraad_koek'))] * 2 + [origineel.id])
+            self.env.invalidate_all()
+            origineel._verwerk_verkoop_delta({
+                origineel.id: (sum(kopieen.mapped('totaal_verkocht')), sum(kopieen.mapped('totaal_omzet'))),
+            })
+            origineel.tags_ids |= kopieen.tags_ids
+            samengevoegd |= kopieen
+            _logger.info("Verse batches %s samengevoegd in %s", kopieen.ids, origineel.name_koek)
+        
+        samengevoegd.unlink()
+        Batch._werk_vervaldatum_koeken_bij(koeken.exists().ids)
+        if samengevoegd:
+            # Verkopen hebben een andere koek gekregen, laat het rapport volledig herbouwen
+            self.env['ir.config_parameter'].sudo().set_param(
+                self.env['bakker_verkoop_rapport'].WATERMARK_PARAM, False,
+            )
+        return len(samengevoegd)
+    
+    @api.model
+    def _importeer_catalogus(self, rijen, chunk_size=1000):
+        """Maak koeken aan uit een lijst van dicts, in chunks
+    
+        Verwachte kolommen: name_koek, prijs_koek, voorraad_koek, categorie,
+        tags (gescheiden door komma's) en optioneel pudding_koek.
+        Rijen met fouten worden overgeslagen en gemeld, de rest wordt aangemaakt.
+    
+        :return: {'aangemaakt': aantal, 'fouten': [(rijnummer, melding)]}
+        """
+        # Categorieën en tags in één query elk opzoeken
+        categorie_namen = {(rij.get('categorie') or '').strip() for rij in rijen} - {''}
+        categorieen = {
+            categorie.name: categorie.id
+            for categorie in self.env['bakker_koeken_categorie'].with_context(active_test=False).search([('name', 'in', list(categorie_namen))])
+        }
+        tag_namen = {tag.strip() for rij in rijen for tag in (rij.get('tags') or '').split(',')} - {''}
+        tags = {tag.name: tag.id for tag in self.env['bakker_koeken_tags'].search([('name', 'in', list(tag_namen))])}
+    
+        fouten = []
+        aangemaakt = 0
+        for start in range(0, len(rijen), chunk_size):
+            # Rijnummer 2 is de eerste rij na de kolomtitels
+            chunk = list(enumerate(rijen[start:start + chunk_size], start=start + 2))
+            vals_list, rijnummers = [], []
+            for rijnummer, rij in chunk:
+                vals, fout = self._import_vals(rij, categorieen, tags)
+                if fout:
+                    fouten.append((rijnummer, fout))
+                else:
+                    vals_list.append(vals)
+                    rijnummers.append(rijnummer)
+            aangemaakt += self._maak_import_chunk(vals_list, rijnummers, fouten)
+        _logger.info("Catalogus import: %s koeken aangemaakt, %s fouten", aangemaakt, len(fouten))
+        return {'aangemaakt': aangemaakt, 'fouten': fouten}
+    
+    @api.model
+    def _import_vals(self, rij, categorieen, tags):
+        """Zet één CSV rij om naar create waarden, of geef een foutmelding"""
+        naam = (rij.get('name_koek') or '').strip()
+        if not naam:
+            return None, "naam ontbreekt"
+        try:
+            prijs = float((rij.get('prijs_koek') or '0').replace(',', '.'))
+            voorraad = int(rij.get('voorraad_koek') or 0)
+        except ValueError:
+            return None, "prijs of voorraad is geen getal"
+        if prijs < 0 or voorraad < 0:
+            return None, "prijs en voorraad kunnen niet negatief zijn"
+    
+        categorie = (rij.get('categorie') or '').strip()
+        if categorie not in categorieen:
+            return None, f"onbekende categorie '{categorie}'"
+        tag_namen = [tag.strip() for tag in (rij.get('tags') or '').split(',') if tag.strip()]
+        onbekend = [tag for tag in tag_namen if tag not in tags]
+        if onbekend:
+            return None, f"onbekende tags {', '.join(onbekend)}"
+    
+        return {
+            'name_koek': naam,
+            'prijs_koek': prijs,
+            'voorraad_koek': voorraad,
+            'categorie_koek_id': categorieen[categorie],
+            'tags_ids': [(6, 0, [tags[tag] for tag in tag_namen])],
+            'pudding_koek': (rij.get('pudding_koek') or '').strip().lower() in ('1', 'true', 'ja', 'x'),
+        }, None
+    
+    @api.model
+    def _maak_import_chunk(self, vals_list, rijnummers, fouten):
+        """Maak een chunk in één create, val bij een fout terug op rij per rij"""
+        if not vals_list:
+            return 0
+        try:
+            with self.env.cr.savepoint():
+                self.create(vals_list)
+            return len(vals_list)
+        except Exception:
+            _logger.info("Import chunk mislukt, rij per rij opnieuw")
+    
+        aangemaakt = 0
+        for vals, rijnummer in zip(vals_list, rijnummers):
+            try:
+                with self.env.cr.savepoint():
+                    self.create(vals)
+                aangemaakt += 1
+            except Exception as e:
+                fouten.append((rijnummer, str(e)))
+        return aangemaakt
+    
+    @gemeten
     def action_voorraad_bijvullen(self):
-        """Vul voorraad bij met standaard hoeveelheid"""
-        for record in self:
-            record.voorraad_koek += 20
-            record.aankoopdatum_koek = fields.Date.today()
+        """Vul voorraad bij volgens het bijvulvoorstel, of met de standaard hoeveelheid"""
+        voorstellen = self.env['bakker_bijvul_voorstel'].search([('koek_id', 'in', self.ids), ('status', '=', 'nieuw')])
+        aantallen = {record.id: 20 for record in self}
+        aantallen.update({voorstel.koek_id.id: voorstel.aantal for voorstel in voorstellen if voorstel.aantal > 0})
+        self._voorraad_bijwerken(aantallen)
+        self.write({'aankoopdatum_koek': fields.Date.today()})
+        voorstellen.write({'status': 'toegepast'})
             
         return {
             'type': 'ir.actions.client',
             'tag': 'reload',
             'params': {
                 'title': 'Voorraad Bijgevuld!',
-                'message': f'Voorraad van {self.name_koek} is bijgevuld met 20 stuks',
+                'message': f'Voorraad bijgevuld: {self.name_koek} (+{aantallen[self.id]})' if len(self) == 1
+                           else f'{len(self)} koeken bijgevuld met samen {sum(aantallen.values())} stuks',
                 'type': 'success',
             }
         }
     
+    @gemeten
     def action_uitverkocht(self):
         """Markeer als uitverkocht"""
-        for record in self:
-            record.voorraad_koek = 0
+        self._voorraad_bijwerken({record.id: 0 for record in self}, absoluut=True)
         return True
     
+    @gemeten
     def action_verse_batch(self):
-        """Maak nieuwe verse batch - duplicate record"""
-        for record in self:
-            # Maak een kopie van het huidige record
-            new_batch = record.copy({
-                'voorraad_koek': 30,
-                'aankoopdatum_koek': fields.Date.today(),
-                'vervaldatum_koek': fields.Date.today() + timedelta(days=30),
-                'name_koek': f"{record.name_koek} - Verse Batch",
-            })
-            
-            vers_tag = self.env['bakker_koeken_tags'].search([('name', '=', 'Vers')], limit=1)
-            if vers_tag:
-                new_batch.tags_ids = [(4, vers_tag.id)]
+        """Maak nieuwe verse batch van 30 stuks voor deze koeken"""
+        self._voorraad_bijwerken({record.id: 30 for record in self})
+        self.write({'aankoopdatum_koek': fields.Date.today()})
+        self._voeg_tag_toe('Bakker.tag_vers_gebakken')
         
         return {
             'type': 'ir.actions.act_window',
             'name': 'Nieuwe Verse Batch',
             'res_model': 'bakker_koeken',
-            'res_id': new_batch.id,
+            'res_id': self[-1:].id,
             'view_mode': 'form',
             'target': 'current',
             'effect': {
@@ -114,32 +585,37 @@ class BakkerKoeken(models.Model):
             }
         }
     
+    def _voeg_tag_toe(self, xmlid):
+        """Koppel een tag aan alle koeken met één Many2many write"""
+        # Opzoeken via de xmlid gebruikt de cache van ir.model.data, ook na het hernoemen van de tag
+        tag = self.env.ref(xmlid, raise_if_not_found=False)
+        if tag and self:
+            self.write({'tags_ids': [(4, tag.id)]})
+    
+    @gemeten
     def action_mark_populair(self):
         """Markeer als populair"""
-        populair_tag = self.env['bakker_koeken_tags'].search([('name', '=', 'Populair')], limit=1)
-        for record in self:
-            if populair_tag:
-                record.tags_ids = [(4, populair_tag.id)]
+        self._voeg_tag_toe('Bakker.tag_populair')
         return True
     
+    @gemeten
     def action_seizoen_special(self):
         """Markeer als seizoensspecial"""
-        seizoen_tag = self.env['bakker_koeken_tags'].search([('name', '=', 'Seizoen')], limit=1)
+        self._voeg_tag_toe('Bakker.tag_seizoen')
+        # 15% prijsverhoging, één write per prijs
+        per_prijs = defaultdict(lambda: self.browse())
         for record in self:
-            if seizoen_tag:
-                record.tags_ids = [(4, seizoen_tag.id)]
-            record.prijs_koek = record.prijs_koek * 1.15  # 15% prijsverhoging
+            per_prijs[record.prijs_koek] |= record
+        for prijs, koeken in per_prijs.items():
+            koeken.prijs_koek = prijs * 1.15
         return True
     
+    @gemeten
     def action_kwaliteitscontrole(self):
         """Doe kwaliteitscontrole"""
         import random
-        for record in self:
-            if random.choice([True, False]):  # 50% kans
-                
-                vers_tag = self.env['bakker_koeken_tags'].search([('name', '=', 'Vers')], limit=1)
-                if vers_tag:
-                    record.tags_ids = [(4, vers_tag.id)]
+        goedgekeurd = self.filtered(lambda record: random.choice([True, False]))  # 50% kans
+        goedgekeurd._voeg_tag_toe('Bakker.tag_vers_gebakken')
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
@@ -153,21 +629,13 @@ class BakkerKoeken(models.Model):
     def action_view_low_stock(self):
         """Toon koeken met lage voorraad"""
         action = self.env.ref('Bakker.bakker_koeken_action').read()[0]
-        action['domain'] = [('voorraad_koek', '<=', 10)]
+        action['domain'] = [('onder_bestelpunt', '=', True)]
         action['context'] = {'search_default_filter_voorraad_laag': 1}
         return action
     
     def action_verkoop_rapport(self):
         """Genereer verkoop rapport"""
-        return {
-            'name': 'Verkoop Rapport',
-            'type': 'ir.actions.act_window',
-            'res_model': 'bakker_koeken',
-            'view_mode': 'pivot,graph',
-            'context': {
-                'group_by': ['categorie_koek_id'],
-            }
-        }
+        return self.env['ir.actions.act_window']._for_xml_id('Bakker.action_bakker_verkoop_rapport')
     
     def action_verkoop_koek(self):
         """Open wizard om koeken te verkopen"""
@@ -184,9 +652,9 @@ class BakkerKoeken(models.Model):
         }
     
     def action_view_verkopen(self):
-        """Toon alle verkopen voor deze koek"""
+        """Toon de recente, niet gearchiveerde verkopen voor deze koek"""
         return {
-            'name': f'Verkopen voor {self.name_koek}',
+            'name': f'Recente verkopen voor {self.name_koek}',
             'type': 'ir.actions.act_window',
             'res_model': 'bakker_verkoop',
             'view_mode': 'list,form',
@@ -194,32 +662,13 @@ class BakkerKoeken(models.Model):
             'context': {'default_koek_id': self.id}
         }
     
+    @gemeten
     def action_snelle_verkoop(self):
         """Snelle verkoop - direct 1 koek verkopen"""
         if self.voorraad_koek <= 0:
             raise ValidationError("Geen voorraad beschikbaar!")
         
-        # Zoek of maak een standaard walk-in klant
-        walk_in_klant = self.env['res.partner'].search([('name', '=', 'Walk-in klant')], limit=1)
-        if not walk_in_klant:
-            walk_in_klant = self.env['res.partner'].create({
-                'name': 'Walk-in klant',
-                'is_company': False,
-                'customer_rank': 1,
-                'street': 'Bakkerij',
-                'email': 'walkin@bakkerij.local'
-            })
-        
-        verkoop = self.env['bakker_verkoop'].create({
-            'koek_id': self.id,
-            'partner_id': walk_in_klant.id,
-            'aantal': 1,
-            'prijs_per_stuk': self.prijs_koek,
-            'betaal_methode': 'cash',
-        })
-        
-        verkoop.action_bevestig_verkoop()
-        verkoop.action_markeer_betaald()
+        self.snelle_verkoop(self.id)
         
         return {
             'type': 'ir.actions.client',
@@ -230,4 +679,25 @@ class BakkerKoeken(models.Model):
                 'type': 'success',
             }
         }
+    
+    @api.model
+    @gemeten
+    def snelle_verkoop(self, koek_id, aantal=1, betaal_methode='cash'):
+        """Verkoop aan de walk-in klant zonder notificatie, voor kassa's met veel verkopen
 
+        :return: id van de betaalde verkoop
+        """
+        koek = self.browse(koek_id)
+        verkoop = self.env['bakker_verkoop'].create_and_settle_batch([{
+            'koek_id': koek.id,
+            'partner_id': self._walk_in_klant().id,
+            'aantal': aantal,
+            'prijs_per_stuk': koek.prijs_koek,
+            'betaal_methode': betaal_methode,
+        }])
+        return verkoop.id
+    
+    @api.model
+    def _walk_in_klant(self):
+        """Standaard klant voor verkopen aan de toonbank, opgezocht via de gecachte xml-id"""
+        return self.env.ref('Bakker.partner_walk_in_klant')
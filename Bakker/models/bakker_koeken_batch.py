@@ -0,0 +1,140 @@
+from odoo import models, fields, api
+from odoo.tools.sql import create_index
+from collections import defaultdict
+from datetime import timedelta
+
+
+class BakkerKoekenBatch(models.Model):
+    _name = "bakker_koeken_batch"
+    _description = "Productiebatch van een koek"
+    _order = "vervaldatum asc, id asc"
+    _rec_name = "productiedatum"
+
+    koek_id = fields.Many2one('bakker_koeken', string="Koek", required=True, ondelete='cascade', index=True)
+    aantal = fields.Integer(string="Geproduceerd", required=True, readonly=True)
+    resterend = fields.Integer(string="Resterend", required=True, readonly=True)
+    productiedatum = fields.Date(string="Productiedatum", required=True, default=fields.Date.today, readonly=True)
+    vervaldatum = fields.Date(string="Vervaldatum", required=True, default=lambda self: fields.Date.today() + timedelta(days=30), readonly=True)
+
+    def init(self):
+        # Actieve batches per koek in FIFO volgorde
+        create_index(self.env.cr, 'bakker_koeken_batch_fifo_idx', self._table, ['koek_id', 'vervaldatum', 'id'], where="resterend > 0")
+        # Vervallen batches met voorraad, voor de afschrijf cron
+        create_index(self.env.cr, 'bakker_koeken_batch_vervallen_idx', self._table, ['vervaldatum'], where="resterend > 0")
+
+    @api.model
+    def _pas_batches_aan(self, deltas, productiedatum=None, vervaldatum=None, terugzetten=False):
+        """Verwerk voorraadwijzigingen {koek_id: delta} op de batches
+
+        Een positieve delta wordt een nieuwe batch, een negatieve delta wordt
+        FIFO (vroegste vervaldatum eerst) van de actieve batches afgehaald.
+        Met ``terugzetten`` gaat een positieve delta eerst terug naar de batches
+        die het laatst verbruikt werden, met hun eigen vervaldatum.
+        De voorraad op bakker_koeken zelf wordt door de aanroeper bijgewerkt.
+        """
+        bijvullen = {koek_id: delta for koek_id, delta in deltas.items() if delta > 0}
+        verbruiken = {koek_id: -delta for koek_id, delta in deltas.items() if delta < 0}
+
+        if bijvullen and terugzetten:
+            bijvullen = self._zet_terug(bijvullen)
+
+        if bijvullen:
+            vandaag = fields.Date.context_today(self)
+            self.create([{
+                'koek_id': koek_id,
+                'aantal': aantal,
+                'resterend': aantal,
+                'productiedatum': productiedatum or vandaag,
+                'vervaldatum': vervaldatum or vandaag + timedelta(days=30),
+            } for koek_id, aantal in bijvullen.items()])
+
+        if verbruiken:
+            self._verbruik_fifo(verbruiken)
+
+        self._werk_vervaldatum_koeken_bij(list(deltas))
+
+    @api.model
+    def _verbruik_fifo(self, verbruiken):
+        """Haal {koek_id: aantal} van de oudste batches af"""
+        self.flush_model(['resterend'])
+        self.env.cr.execute("""
+            SELECT id, koek_id, resterend
+              FROM bakker_koeken_batch
+             WHERE koek_id = ANY(%s) AND resterend > 0
+          ORDER BY koek_id, vervaldatum, id
+               FOR UPDATE
+        """, [sorted(verbruiken)])
+        nog_nodig = defaultdict(int, verbruiken)
+        batch_ids, nieuw_resterend = [], []
+        for batch_id, koek_id, resterend in self.env.cr.fetchall():
+            if not nog_nodig[koek_id]:
+                continue
+            genomen = min(resterend, nog_nodig[koek_id])
+            nog_nodig[koek_id] -= genomen
+            batch_ids.append(batch_id)
+            nieuw_resterend.append(resterend - genomen)
+        if batch_ids:
+            self.env.cr.execute("""
+                UPDATE bakker_koeken_batch b
+                   SET resterend = d.resterend,
+                       write_uid = %s,
+                       write_date = now() AT TIME ZONE 'UTC'
+                  FROM unnest(%s::int[], %s::int[]) AS d(id, resterend)
+                 WHERE b.id = d.id
+            """, [self.env.uid, batch_ids, nieuw_resterend])
+            self.browse(batch_ids).invalidate_recordset(['resterend', 'write_uid', 'write_date'])
+
+    @api.model
+    def _zet_terug(self, teruggaven):
+        """Zet {koek_id: aantal} terug op de verbruikte batches, omgekeerde FIFO volgorde
+
+        FIFO verbruikt de batches in volgorde, de laatst verbruikte batch is dus
+        de aangebroken batch met de laatste vervaldatum.
+
+        :return: {koek_id: aantal} dat in geen enkele batch meer past
+        """
+        self.flush_model(['resterend'])
+        self.env.cr.execute("""
+            SELECT id, koek_id, aantal - resterend
+              FROM bakker_koeken_batch
+             WHERE koek_id = ANY(%s) AND resterend < aantal
+          ORDER BY koek_id, vervaldatum DESC, id DESC
+               FOR UPDATE
+        """, [sorted(teruggaven)])
+        nog_terug = defaultdict(int, teruggaven)
+        batch_ids, terug = [], []
+        for batch_id, koek_id, verbruikt in self.env.cr.fetchall():
+            if not nog_terug[koek_id]:
+                continue
+            aantal = min(verbruikt, nog_terug[koek_id])
+            nog_terug[koek_id] -= aantal
+            batch_ids.append(batch_id)
+            terug.append(aantal)
+        if batch_ids:
+            self.env.cr.execute("""
+                UPDATE bakker_koeken_batch b
+                   SET resterend = b.resterend + d.aantal,
+                       write_uid = %s,
+                       write_date = now() AT TIME ZONE 'UTC'
+                  FROM unnest(%s::int[], %s::int[]) AS d(id, aantal)
+                 WHERE b.id = d.id
+            """, [self.env.uid, batch_ids, terug])
+            self.browse(batch_ids).invalidate_recordset(['resterend', 'write_uid', 'write_date'])
+        return {koek_id: aantal for koek_id, aantal in nog_terug.items() if aantal}
+
+    @api.model
+    def _werk_vervaldatum_koeken_bij(self, koek_ids):
+        """Zet vervaldatum_koek op de vroegste vervaldatum van de actieve batches"""
+        if not koek_ids:
+            return
+        self.env['bakker_koeken'].flush_model(['vervaldatum_koek'])
+        self.env.cr.execute("""
+            UPDATE bakker_koeken k
+               SET vervaldatum_koek = b.vervaldatum
+              FROM (SELECT koek_id, MIN(vervaldatum) AS vervaldatum
+                      FROM bakker_koeken_batch
+                     WHERE koek_id = ANY(%s) AND resterend > 0
+                  GROUP BY koek_id) b
+             WHERE k.id = b.koek_id AND k.vervaldatum_koek IS DISTINCT FROM b.vervaldatum
+        """, [list(koek_ids)])
+        self.env['bakker_koeken'].browse(koek_ids).invalidate_recordset(['vervaldatum_koek'])
@@ -6,6 +6,18 @@ class BakkerKoekenCategorie(models.Model):
     _order = "name asc"
     
 
-    name = fields.Char(string="Categorie naam", required=True)
+    name = fields.Char(string="Categorie naam", required=True, index='trigram')
     beschrijving = fields.Text(string="Beschrijving")
-    active = fields.Boolean(string="Actief", default=True)
\ No newline at end of file
+    active = fields.Boolean(string="Actief", default=True)
+
+    # Cijfers uit de gecachte dashboard snapshot
+    voorraad_waarde = fields.Float(string="Voorraad Waarde", compute='_compute_dashboard')
+    aantal_laag = fields.Integer(string="Lage Voorraad", compute='_compute_dashboard')
+    aantal_vervallen = fields.Integer(string="Vervallen", compute='_compute_dashboard')
+    omzet_vandaag = fields.Float(string="Omzet Vandaag", compute='_compute_dashboard')
+
+    def _compute_dashboard(self):
+        snapshot = self.env['bakker_dashboard']._snapshot()
+        leeg = {'voorraad_waarde': 0.0, 'aantal_laag': 0, 'aantal_vervallen': 0, 'omzet_vandaag': 0.0}
+        for record in self:
+            record.update(snapshot.get(record._origin.id, leeg))
@@ -0,0 +1,42 @@
+from odoo import models, fields
+from odoo.exceptions import UserError
+import base64
+import csv
+import io
+
+
+class BakkerKoekenImportWizard(models.TransientModel):
+    _name = 'bakker.koeken.import.wizard'
+    _description = 'Wizard voor het importeren van de koeken catalogus'
+
+    CHUNK = 1000
+
+    bestand = fields.Binary(string='CSV Bestand', required=True)
+    bestandsnaam = fields.Char(string='Bestandsnaam')
+    aantal_aangemaakt = fields.Integer(string='Aangemaakt', readonly=True)
+    fouten = fields.Text(string='Fouten', readonly=True)
+    klaar = fields.Boolean(string='Klaar', default=False)
+
+    def action_importeer(self):
+        """Importeer de koeken uit het CSV bestand"""
+        self.ensure_one()
+        try:
+            inhoud = base64.b64decode(self.bestand).decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise UserError("Het bestand moet een UTF-8 CSV bestand zijn.")
+        rijen = list(csv.DictReader(io.StringIO(inhoud), delimiter=';' if ';' in inhoud.split('\n', 1)[0] else ','))
+
+        resultaat = self.env['bakker_koeken']._importeer_catalogus(rijen, chunk_size=self.CHUNK)
+        self.write({
+            'aantal_aangemaakt': resultaat['aangemaakt'],
+            'fouten': "\n".join(f"Rij {rij}: {fout}" for rij, fout in resultaat['fouten']) or False,
+            'klaar': True,
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Koeken Importeren',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
@@ -0,0 +1,195 @@
+from odoo import models, fields, api, tools
+from odoo.tools import str2bool
+from odoo.tools.profiler import Profiler
+from odoo.tools.sql import create_index
+from contextlib import nullcontext
+from datetime import timedelta
+import functools
+import json
+import logging
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Acties waarvan de volgende aanroep geprofileerd wordt, na een trage aanroep (per worker)
+_TE_PROFILEREN = set()
+
+
+def gemeten(func):
+    """Decorator die duur, queries en aantal records van een actie bijhoudt
+
+    Plaats hem direct boven de ``def``, onder ``@api.model``. Niet voor computes:
+    die lopen te vaak en binnen andere metingen.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        Meting = self.env['bakker_meting']
+        instellingen = Meting._instellingen()
+        if not instellingen['actief']:
+            return func(self, *args, **kwargs)
+
+        naam = f"{self._name}.{func.__name__}"
+        cr = self.env.cr
+        thread = threading.current_thread()
+        profiler = None
+        if naam in _TE_PROFILEREN:
+            _TE_PROFILEREN.discard(naam)
+            profiler = Profiler(db=cr.dbname, collectors=['sql', 'traces_async'], description=f"Bakker: {naam}")
+
+        # Voor @api.model methodes met een vals_list tellen we de vals
+        records = len(self) or (len(args[0]) if args and isinstance(args[0], list) else 0)
+        queries_voor = cr.sql_log_count
+        query_tijd_voor = getattr(thread, 'query_time', 0.0)
+        start = time.perf_counter()
+        gelukt = False
+        try:
+            with profiler if profiler is not None else nullcontext():
+                resultaat = func(self, *args, **kwargs)
+            gelukt = True
+            return resultaat
+        finally:
+            Meting._registreer({
+                'naam': naam,
+                'duur_ms': (time.perf_counter() - start) * 1000,
+                'queries': cr.sql_log_count - queries_voor,
+                'query_ms': (getattr(thread, 'query_time', 0.0) - query_tijd_voor) * 1000,
+                'records': records,
+                'gelukt': gelukt,
+                'profile_id': getattr(profiler, 'profile_id', None),
+            }, instellingen)
+    return wrapper
+
+
+class BakkerMeting(models.Model):
+    _name = "bakker_meting"
+    _description = "Meting van een Bakker actie"
+    _order = "datum desc, id desc"
+    _rec_name = "naam"
+
+    naam = fields.Char(string="Actie", readonly=True, index=True)
+    datum = fields.Datetime(string="Datum", readonly=True)
+    user_id = fields.Many2one('res.users', string="Gebruiker", readonly=True)
+    duur_ms = fields.Float(string="Duur (ms)", readonly=True, digits=(16, 1))
+    queries = fields.Integer(string="Queries", readonly=True)
+    query_ms = fields.Float(string="Query Tijd (ms)", readonly=True, digits=(16, 1))
+    records = fields.Integer(string="Records", readonly=True)
+    traag = fields.Boolean(string="Traag", readonly=True)
+    profile_id = fields.Many2one('ir.profile', string="Profiel", readonly=True, ondelete='set null')
+
+    def init(self):
+        create_index(self.env.cr, 'bakker_meting_naam_datum_idx', self._table, ['naam', 'datum'])
+        create_index(self.env.cr, 'bakker_meting_datum_idx', self._table, ['datum'])
+
+    @api.model
+    def _instellingen(self):
+        params = self.env['ir.config_parameter'].sudo()
+        return {
+            'actief': str2bool(params.get_param('Bakker.meting_actief', 'False')),
+            'drempel_ms': float(params.get_param('Bakker.meting_trage_drempel_ms', 1000)),
+        }
+
+    @api.model
+    def _registreer(self, meting, instellingen):
+        """Schrijf een meting weg als logregel en bewaar ze voor de tabel
+
+        De metingen van een transactie worden net voor de commit in één INSERT
+        weggeschreven, dus één keer per request of cron batch.
+        """
+        meting['traag'] = meting['duur_ms'] >= instellingen['drempel_ms']
+        meting['uid'] = self.env.uid
+        if meting['traag'] and not meting['profile_id']:
+            # Een trage aanroep kan niet meer geprofileerd worden, de volgende wel
+            _TE_PROFILEREN.add(meting['naam'])
+        log = _logger.warning if meting['traag'] else _logger.info
+        log("bakker_meting %s", json.dumps(meting, sort_keys=True, default=str))
+
+        # Na een fout is de transactie afgebroken, op een read-only cursor kan niet geschreven worden
+        cr = self.env.cr
+        if not meting['gelukt'] or cr.readonly:
+            return
+        buffer = cr.precommit.data.setdefault('bakker_meting', [])
+        if not buffer:
+            cr.precommit.add(self._schrijf_metingen)
+        buffer.append(meting)
+
+    @api.model
+    def _schrijf_metingen(self):
+        """Schrijf de gebufferde metingen van deze transactie weg met één INSERT"""
+        metingen = self.env.cr.precommit.data.pop('bakker_meting', [])
+        if not metingen:
+            return
+        kolommen = ['naam', 'uid', 'duur_ms', 'queries', 'query_ms', 'records', 'traag', 'profile_id']
+        self.env.cr.execute("""
+            INSERT INTO bakker_meting (
+                naam, datum, user_id, duur_ms, queries, query_ms, records, traag, profile_id,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT m.naam, now() AT TIME ZONE 'UTC', m.uid, m.duur_ms, m.queries, m.query_ms,
+                   m.records, m.traag, m.profile_id,
+                   m.uid, now() AT TIME ZONE 'UTC', m.uid, now() AT TIME ZONE 'UTC'
+              FROM unnest(%s::varchar[], %s::int[], %s::float8[], %s::int[], %s::float8[],
+                          %s::int[], %s::bool[], %s::int[])
+                   AS m(naam, uid, duur_ms, queries, query_ms, records, traag, profile_id)
+        """, [[meting[kolom] for meting in metingen] for kolom in kolommen])
+
+    @api.model
+    def _cron_ruim_metingen_op(self, batch_size=10000):
+        """Verwijder metingen ouder dan de bewaartermijn"""
+        dagen = int(self.env['ir.config_parameter'].sudo().get_param('Bakker.meting_bewaardagen', 7))
+        grens = fields.Datetime.now() - timedelta(days=dagen)
+        while True:
+            self.env.cr.execute("""
+                DELETE FROM bakker_meting
+                 WHERE id IN (SELECT id FROM bakker_meting WHERE datum < %s LIMIT %s)
+            """, [grens, batch_size])
+            if self.env.cr.rowcount < batch_size:
+                break
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+        self.env.invalidate_all()
+
+
+class BakkerMetingStatistiek(models.Model):
+    _name = "bakker_meting_statistiek"
+    _description = "Percentielen per Bakker actie"
+    _auto = False
+    _order = "p95_ms desc"
+    _rec_name = "naam"
+
+    naam = fields.Char(string="Actie", readonly=True)
+    aantal = fields.Integer(string="Aanroepen", readonly=True)
+    p50_ms = fields.Float(string="p50 (ms)", readonly=True, digits=(16, 1))
+    p95_ms = fields.Float(string="p95 (ms)", readonly=True, digits=(16, 1))
+    max_ms = fields.Float(string="Max (ms)", readonly=True, digits=(16, 1))
+    p50_queries = fields.Float(string="p50 Queries", readonly=True, digits=(16, 0))
+    p95_queries = fields.Float(string="p95 Queries", readonly=True, digits=(16, 0))
+    gemiddeld_query_ms = fields.Float(string="Gem. Query Tijd (ms)", readonly=True, digits=(16, 1))
+    aantal_traag = fields.Integer(string="Traag", readonly=True)
+    laatste = fields.Datetime(string="Laatste Aanroep", readonly=True)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(f"""
+            CREATE VIEW {self._table} AS (
+                SELECT MIN(id) AS id,
+                       naam,
+                       COUNT(*) AS aantal,
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY duur_ms) AS p50_ms,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY duur_ms) AS p95_ms,
+                       MAX(duur_ms) AS max_ms,
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY queries) AS p50_queries,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY queries) AS p95_queries,
+                       AVG(query_ms) AS gemiddeld_query_ms,
+                       COUNT(*) FILTER (WHERE traag) AS aantal_traag,
+                       MAX(datum) AS laatste
+                  FROM bakker_meting
+              GROUP BY naam
+            )
+        """)
+
+    def action_view_metingen(self):
+        """Toon de afzonderlijke metingen van deze actie"""
+        action = self.env['ir.actions.act_window']._for_xml_id('Bakker.action_bakker_meting')
+        action['domain'] = [('naam', '=', self.naam)]
+        return action
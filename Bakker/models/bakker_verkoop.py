@@ -1,6 +1,23 @@
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
-import base64
+from odoo.tools.sql import create_index
+from odoo.tools import str2bool
+from odoo.tools.pdf import merge_pdf
+from psycopg2 import errors
+from .bakker_meting import gemeten
+from collections import defaultdict
+from datetime import timedelta
+import hashlib
+import json
+
+# Velden die totaal_verkocht/totaal_omzet op bakker_koeken beïnvloeden
+STATS_VELDEN = {'status', 'koek_id', 'aantal', 'prijs_per_stuk', 'korting_percentage'}
+
+# Aantal facturen per wkhtmltopdf aanroep
+FACTUUR_BATCH = 100
+
+# Maximaal aantal verkopen per kassa synchronisatie
+KASSA_BATCH = 1000
 
 class BakkerVerkoop(models.Model):
     _name = "bakker_verkoop"
@@ -11,7 +28,7 @@ class BakkerVerkoop(models.Model):
     
     name = fields.Char(string="Verkoop Nummer", required=True, default="Nieuw", tracking=True)
     koek_id = fields.Many2one('bakker_koeken', string="Koek", required=True, tracking=True)
-    partner_id = fields.Many2one('res.partner', string="Klant", required=True, tracking=True)
+    partner_id = fields.Many2one('res.partner', string="Klant", required=True, tracking=True, index=True)
     klant_email = fields.Char(string="Email", related='partner_id.email', readonly=True)
     klant_telefoon = fields.Char(string="Telefoon", related='partner_id.phone', readonly=True)
     aantal = fields.Integer(string="Aantal", required=True, default=1, tracking=True)
@@ -33,12 +50,254 @@ class BakkerVerkoop(models.Model):
         ('digital', 'Digitaal')
     ], string="Betaal Methode", tracking=True)
     opmerkingen = fields.Text(string="Opmerkingen")
+    factuur_hash = fields.Char(string="Factuur Hash", copy=False, readonly=True)
+    factuur_attachment_id = fields.Many2one('ir.attachment', string="Factuur PDF", copy=False, readonly=True)
+    factuur_in_wachtrij = fields.Boolean(string="Factuur In Wachtrij", copy=False, readonly=True, help="De factuur wordt op de achtergrond gerenderd")
+    kassa = fields.Char(string="Kassa", copy=False, readonly=True, help="Kassa die de verkoop gesynchroniseerd heeft")
+    kassa_sleutel = fields.Char(string="Kassa Sleutel", copy=False, readonly=True, help="Idempotentie sleutel van de kassa, een verkoop met dezelfde sleutel van dezelfde kassa wordt niet opnieuw geboekt")
+    
+    _sql_constraints = [
+        # Elke kassa nummert zelf, de sleutel is enkel uniek per kassa
+        ('kassa_sleutel_uniek', 'unique(kassa, kassa_sleutel)', "Deze kassa verkoop is al geboekt."),
+    ]
+    
+    def init(self):
+        cr = self.env.cr
+        # Verkopen per koek, gefilterd op status (action_view_verkopen, stats)
+        create_index(cr, 'bakker_verkoop_koek_status_idx', self._table, ['koek_id', 'status'])
+        # Standaard sortering van de lijst (_order = verkoop_datum desc)
+        create_index(cr, 'bakker_verkoop_verkoop_datum_idx', self._table, ['verkoop_datum DESC', 'id DESC'])
+        # Betaalde verkopen per koek, dekt de sommen van de stats reconciliatie
+        create_index(cr, 'bakker_verkoop_betaald_koek_idx', self._table, ['koek_id', 'aantal', 'totaal_bedrag'], where="status = 'betaald'")
+        # Incrementeel verversen van het verkoop rapport
+        create_index(cr, 'bakker_verkoop_write_date_idx', self._table, ['write_date'])
+        # Facturen die op de achtergrond gerenderd moeten worden
+        create_index(cr, 'bakker_verkoop_factuur_in_wachtrij_idx', self._table, ['id'], where="factuur_in_wachtrij")
+    
+    @api.model_create_multi
+    def create(self, vals_list):
+        nieuwe = [vals for vals in vals_list if vals.get('name', 'Nieuw') == 'Nieuw']
+        if nieuwe:
+            for vals, nummer in zip(nieuwe, self._reserveer_nummers(len(nieuwe))):
+                vals['name'] = nummer
+        verkopen = super().create(vals_list)
+        verkopen._pas_koek_stats_aan(verkopen._betaalde_stats_per_koek())
+        return verkopen
+    
+    def write(self, vals):
+        # De cron vindt enkel de nieuwe dag via write_date, ververs de oude dag meteen
+        oude_dagen = self._verkoop_dagen() if 'verkoop_datum' in vals else []
+        if not STATS_VELDEN.intersection(vals):
+            res = super().write(vals)
+        else:
+            voor = self._betaalde_stats_per_koek()
+            res = super().write(vals)
+            na = self._betaalde_stats_per_koek()
+            self._pas_koek_stats_aan(na, voor)
+        if oude_dagen:
+            self.env['bakker_verkoop_rapport'].sudo()._ververs_dagen(oude_dagen)
+        return res
+    
+    def unlink(self):
+        voor = self._betaalde_stats_per_koek()
+        dagen = self._verkoop_dagen()
+        res = super().unlink()
+        self._pas_koek_stats_aan({}, voor)
+        # Verwijderde verkopen zijn niet via write_date te vinden, ververs het rapport meteen
+        self.env['bakker_verkoop_rapport'].sudo()._ververs_dagen(dagen)
+        self.env['bakker_dashboard']._markeer_verwijderd()
+        return res
+    
+    def _verkoop_dagen(self):
+        """Verschillende dagen van de verkopen, zoals gegroepeerd in het rapport"""
+        return list({fields.Datetime.to_datetime(datum).date() for datum in self.mapped('verkoop_datum') if datum})
+    
+    def _aantal_per_koek(self):
+        """Totaal aantal verkochte koeken, per koek"""
+        aantallen = defaultdict(int)
+        for record in self:
+            aantallen[record.koek_id.id] += record.aantal
+        return aantallen
+    
+    def _betaalde_stats_per_koek(self):
+        """Som van aantal en omzet van de betaalde verkopen, per koek"""
+        stats = defaultdict(lambda: [0, 0.0])
+        for record in self.filtered(lambda v: v.status == 'betaald'):
+            stats[record.koek_id.id][0] += record.aantal
+            stats[record.koek_id.id][1] += record.totaal_bedrag
+        return stats
+    
+    def _pas_koek_stats_aan(self, na, voor=None):
+        """Werk totaal_verkocht en totaal_omzet van de koeken bij met het verschil"""
+        voor = voor or {}
+        deltas = {}
+        for koek_id in set(na) | set(voor):
+            nieuw = na.get(koek_id, (0, 0.0))
+            oud = voor.get(koek_id, (0, 0.0))
+            deltas[koek_id] = (nieuw[0] - oud[0], nieuw[1] - oud[1])
+        self.env['bakker_koeken']._verwerk_verkoop_delta(deltas)
+    
+    @api.model
+    def _reserveer_nummers(self, aantal):
+        """Reserveer een blok verkoopnummers met één nextval round-trip"""
+        sequence = self.env.ref('Bakker.seq_bakker_verkoop', raise_if_not_found=False)
+        if not sequence or sequence.sudo().implementation != 'standard':
+            return [self.env['ir.sequence'].next_by_code('bakker.verkoop') or 'Nieuw' for _ in range(aantal)]
+        
+        sequence = sequence.sudo()
+        self.env.cr.execute(
+            "SELECT nextval(%s) FROM generate_series(1, %s)",
+            [f"ir_sequence_{sequence.id:03d}", aantal],
+        )
+        return [sequence.get_next_char(nummer) for nummer, in self.env.cr.fetchall()]
+    
+    @api.model
+    @gemeten
+    def create_and_settle_batch(self, vals_list):
+        """Maak, bevestig en betaal een reeks verkopen in één keer"""
+        if not vals_list:
+            return self.browse()
+        
+        if self._high_volume_modus():
+            # Geen tracking en creatie berichten, de statuswissel wordt compact gelogd
+            verkopen = self.with_context(tracking_disable=True).create(vals_list).with_context(tracking_disable=False)
+        else:
+            verkopen = self.create(vals_list)
+        
+        # Zelfde overgangen en controles als de knoppen, telkens één write voor de hele batch
+        verkopen._bevestig()
+        verkopen._betaal()
+        return verkopen
+    
+    @api.model
+    @gemeten
+    def _verwerk_kassa_batch(self, kassa, regels):
+        """Boek een batch offline kassa verkopen in één transactie
+
+        Elke regel is een dict met ``sleutel``, ``koek_id``, ``aantal`` en optioneel
+        ``betaal_methode``, ``prijs_per_stuk``, ``korting_percentage``, ``partner_id``
+        en ``verkoop_datum``. Regels waarvan de sleutel al geboekt is voor deze kassa
+        worden overgeslagen.
+
+        Roep dit aan via ``in_eigen_transactie``: onder READ COMMITTED ziet de opzoeking na
+        de advisory lock de sleutels die een gelijktijdige herhaling net gecommit heeft.
+
+        :return: {'resultaten': [per regel], 'voorraad': {koek_id: voorraad}}
+        """
+        if len(regels) > KASSA_BATCH:
+            raise ValidationError(f"Maximaal {KASSA_BATCH} verkopen per synchronisatie.")
+        sleutels = [str(regel.get('sleutel') or '') for regel in regels]
+        if not all(sleutels):
+            raise ValidationError("Elke kassa verkoop heeft een sleutel nodig.")
+        
+        # Lock de sleutels van deze kassa zodat een herhaalde batch van een andere worker wacht
+        self.env.cr.execute("""
+            SELECT pg_advisory_xact_lock(hashtext(%s), hashtext(s.sleutel))
+              FROM (SELECT DISTINCT sleutel FROM unnest(%s::text[]) AS sleutel ORDER BY sleutel) s
+        """, [kassa, sleutels])
+        self.flush_model(['kassa', 'kassa_sleutel'])
+        self.env.cr.execute(
+            "SELECT kassa_sleutel, id, name FROM bakker_verkoop WHERE kassa = %s AND kassa_sleutel = ANY(%s)",
+            [kassa, sleutels],
+        )
+        geboekt = {sleutel: (verkoop_id, naam) for sleutel, verkoop_id, naam in self.env.cr.fetchall()}
+        
+        koek_ids = {regel.get('koek_id') for regel in regels if isinstance(regel.get('koek_id'), int)}
+        voorraad = self.env['bakker_koeken']._lock_koeken(koek_ids)
+        koeken = self.env['bakker_koeken'].browse(list(voorraad))
+        prijzen = {koek.id: koek.prijs_koek for koek in koeken}
+        walk_in = self.env['bakker_koeken']._walk_in_klant().id
+        partner_ids = set(self.env['res.partner'].browse(
+            {regel['partner_id'] for regel in regels if isinstance(regel.get('partner_id'), int)}
+        ).exists().ids)
+        betaal_methodes = dict(self._fields['betaal_methode'].selection)
+        
+        resultaten, vals_list, nieuw = [], [], []
+        for sleutel, regel in zip(sleutels, regels):
+            resultaat = {'sleutel': sleutel}
+            resultaten.append(resultaat)
+            if sleutel in geboekt:
+                resultaat.update(status='duplicaat', verkoop_id=geboekt[sleutel][0], name=geboekt[sleutel][1])
+                continue
+            koek_id, aantal = regel.get('koek_id'), regel.get('aantal', 1)
+            if koek_id not in voorraad:
+                resultaat.update(status='fout', fout=f"Onbekende koek {koek_id}")
+                continue
+            if not isinstance(aantal, int) or aantal <= 0:
+                resultaat.update(status='fout', fout="Aantal moet een positief geheel getal zijn")
+                continue
+            if aantal > voorraad[koek_id]:
+                resultaat.update(status='fout', fout=f"Niet genoeg voorraad! Beschikbaar: {voorraad[koek_id]}")
+                continue
+            if regel.get('partner_id') and regel['partner_id'] not in partner_ids:
+                resultaat.update(status='fout', fout=f"Onbekende klant {regel['partner_id']}")
+                continue
+            if (regel.get('betaal_methode') or 'cash') not in betaal_methodes:
+                resultaat.update(status='fout', fout=f"Onbekende betaal methode {regel['betaal_methode']}")
+                continue
+            try:
+                verkoop_datum = fields.Datetime.to_datetime(regel.get('verkoop_datum')) or fields.Datetime.now()
+            except (TypeError, ValueError):
+                resultaat.update(status='fout', fout="Ongeldige verkoop datum")
+                continue
+            voorraad[koek_id] -= aantal
+            # Dezelfde sleutel twee keer in één batch wordt maar één keer geboekt
+            geboekt[sleutel] = (False, False)
+            vals_list.append({
+                'koek_id': koek_id,
+                'partner_id': regel.get('partner_id') or walk_in,
+                'aantal': aantal,
+                'prijs_per_stuk': regel.get('prijs_per_stuk', prijzen[koek_id]),
+                'korting_percentage': regel.get('korting_percentage', 0.0),
+                'betaal_methode': regel.get('betaal_methode') or 'cash',
+                'verkoop_datum': verkoop_datum,
+                'kassa': kassa,
+                'kassa_sleutel': sleutel,
+            })
+            nieuw.append(resultaat)
+        
+        try:
+            verkopen = self.create_and_settle_batch(vals_list)
+        except errors.UniqueViolation as e:
+            if e.diag.constraint_name != 'bakker_verkoop_kassa_sleutel_uniek':
+                raise
+            # Onder REPEATABLE READ ziet de opzoeking geen sleutels die na het begin van de
+            # transactie gecommit zijn: een nieuwe transactie ziet ze wel en geeft duplicaat
+            raise errors.SerializationFailure(f"Kassa {kassa}: sleutel gelijktijdig geboekt") from e
+        for resultaat, verkoop in zip(nieuw, verkopen):
+            resultaat.update(status='ok', verkoop_id=verkoop.id, name=verkoop.name)
+        
+        return {
+            'resultaten': resultaten,
+            'voorraad': {koek.id: koek.voorraad_koek for koek in koeken},
+        }
     
     @api.model
-    def create(self, vals):
-        if vals.get('name', 'Nieuw') == 'Nieuw':
-            vals['name'] = self.env['ir.sequence'].next_by_code('bakker.verkoop') or f"VK{fields.Date.today().strftime('%Y%m%d')}-{len(self.search([]))}"
-        return super().create(vals)
+    def _high_volume_modus(self):
+        """Of statuswissels zonder veldtracking en met één compacte log per batch verlopen"""
+        return str2bool(self.env['ir.config_parameter'].sudo().get_param('Bakker.verkoop_high_volume', 'False'))
+    
+    def _zet_status(self, status):
+        """Zet de status van alle verkopen in één write"""
+        if not self._high_volume_modus():
+            self.write({'status': status})
+            return
+        
+        labels = dict(self._fields['status'].selection)
+        oude_status = {record.id: record.status for record in self}
+        self.with_context(tracking_disable=True).write({'status': status})
+        
+        # Eén compacte audit regel per verkoop, in bulk aangemaakt
+        te_loggen = self
+        if not str2bool(self.env['ir.config_parameter'].sudo().get_param('Bakker.walk_in_chatter', 'True')):
+            walk_in_klant = self.env['bakker_koeken']._walk_in_klant()
+            te_loggen = self.filtered(lambda v: v.partner_id != walk_in_klant)
+        if te_loggen:
+            te_loggen._message_log_batch(bodies={
+                record.id: f"{record.name}: {labels[oude_status[record.id]]} → {labels[status]} "
+                           f"({record.aantal}x {record.koek_id.name_koek}, €{record.totaal_bedrag:.2f})"
+                for record in te_loggen
+            })
     
     @api.depends('aantal', 'prijs_per_stuk', 'korting_percentage')
     def _compute_totalen(self):
@@ -53,19 +312,10 @@ class BakkerVerkoop(models.Model):
             if record.status == 'concept' and record.aantal > record.koek_id.voorraad_koek:
                 raise ValidationError(f"Niet genoeg voorraad! Beschikbaar: {record.koek_id.voorraad_koek}")
     
+    @gemeten
     def action_bevestig_verkoop(self):
         """Bevestig de verkoop en update voorraad"""
-        for record in self:
-            if record.status != 'concept':
-                raise ValidationError("Alleen concept verkopen kunnen bevestigd worden.")
-            
-            # Check voorraad nogmaals
-            if record.aantal > record.koek_id.voorraad_koek:
-                raise ValidationError(f"Niet genoeg voorraad! Beschikbaar: {record.koek_id.voorraad_koek}")
-            
-            # Update voorraad
-            record.koek_id.voorraad_koek -= record.aantal
-            record.status = 'bevestigd'
+        self._bevestig()
         
         return {
             'type': 'ir.actions.client',
@@ -77,55 +327,56 @@ class BakkerVerkoop(models.Model):
             }
         }
     
+    @gemeten
     def action_markeer_betaald(self):
         """Markeer als betaald en verstuur factuur email"""
-        for record in self:
-            if record.status != 'bevestigd':
-                raise ValidationError("Alleen bevestigde verkopen kunnen als betaald gemarkeerd worden.")
-            record.status = 'betaald'
-            
-            # Verstuur factuur email als klant een email adres heeft
-            if record.partner_id.email:
-                try:
-                    # Zoek email template
-                    template = self.env.ref('Bakker.email_template_bakker_factuur', raise_if_not_found=False)
-                    if template:
-                        # Verstuur email
-                        template.send_mail(record.id, force_send=True)
-                        
-                        # Log activiteit (nu werkt message_post)
-                        record.message_post(
-                            body=f"Factuur email verstuurd naar {record.partner_id.email}",
-                            subject="Factuur Email Verstuurd"
-                        )
-                except Exception as e:
-                    # Log fout maar stop proces niet
-                    record.message_post(
-                        body=f"Fout bij versturen email: {str(e)}",
-                        subject="Email Fout"
-                    )
+        self._betaal()
         
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
             'params': {
                 'title': '💰 Betaling Ontvangen!',
-                'message': f'Verkoop {self.name} is gemarkeerd als betaald' + (f' en factuur is verstuurd naar {self.partner_id.email}' if self.partner_id.email else ''),
+                'message': f'Verkoop {self.name} is gemarkeerd als betaald' + (f' en factuur wordt verstuurd naar {self.partner_id.email}' if self.partner_id.email else ''),
                 'type': 'success',
             }
         }
     
+    def _bevestig(self):
+        """Concept → bevestigd, de voorraad wordt gereserveerd"""
+        if any(record.status != 'concept' for record in self):
+            raise ValidationError("Alleen concept verkopen kunnen bevestigd worden.")
+        
+        # Check en update voorraad atomair in de database
+        self.env['bakker_koeken']._reserveer_voorraad(self._aantal_per_koek())
+        self._zet_status('bevestigd')
+    
+    def _betaal(self):
+        """Bevestigd → betaald, de factuur email wordt in de wachtrij gezet"""
+        if any(record.status != 'bevestigd' for record in self):
+            raise ValidationError("Alleen bevestigde verkopen kunnen als betaald gemarkeerd worden.")
+        self._zet_status('betaald')
+        self._verstuur_factuur_email()
+    
+    def _verstuur_factuur_email(self):
+        """Zet factuur emails in de wachtrij, de cron verstuurt ze in batches"""
+        # Alleen klanten met een email adres krijgen een factuur
+        verkopen = self.filtered(lambda v: v.partner_id.email)
+        if verkopen:
+            self.env['bakker_factuur_wachtrij'].sudo().create([
+                {'verkoop_id': verkoop.id} for verkoop in verkopen
+            ])
+    
+    @gemeten
     def action_annuleer(self):
         """Annuleer verkoop en herstel voorraad"""
-        for record in self:
-            if record.status == 'betaald':
-                raise ValidationError("Betaalde verkopen kunnen niet geannuleerd worden.")
-            
-            # Herstel voorraad als verkoop bevestigd was
-            if record.status == 'bevestigd':
-                record.koek_id.voorraad_koek += record.aantal
-            
-            record.status = 'geannuleerd'
+        if any(record.status == 'betaald' for record in self):
+            raise ValidationError("Betaalde verkopen kunnen niet geannuleerd worden.")
+        
+        # Herstel voorraad als verkoop bevestigd was
+        bevestigd = self.filtered(lambda v: v.status == 'bevestigd')
+        self.env['bakker_koeken']._geef_voorraad_vrij(bevestigd._aantal_per_koek())
+        self._zet_status('geannuleerd')
         
         return {
             'type': 'ir.actions.client',
@@ -141,6 +392,146 @@ class BakkerVerkoop(models.Model):
         """Print factuur PDF"""
         return self.env.ref('Bakker.report_bakker_factuur').report_action(self)
     
+    @gemeten
+    def action_print_alle_facturen(self):
+        """Download alle geselecteerde facturen als één PDF
+
+        Meer dan één batch gewijzigde facturen wordt op de achtergrond gerenderd.
+        """
+        hashes = {verkoop.id: verkoop._factuur_hash() for verkoop in self}
+        te_renderen = self._verouderde_facturen(hashes)
+        if len(te_renderen) > FACTUUR_BATCH:
+            te_renderen._zet_factuur_in_wachtrij(True)
+            self.env.ref('Bakker.ir_cron_bakker_factuur_render')._trigger()
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': '⏳ Facturen Worden Gerenderd',
+                    'message': f'{len(te_renderen)} facturen worden op de achtergrond gerenderd, print ze straks opnieuw',
+                    'type': 'info',
+                }
+            }
+        if te_renderen:
+            te_renderen._render_factuur_batch(hashes)
+        bundel = self._factuur_bundel(hashes)
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/web/content/{bundel.id}?download=true',
+            'target': 'self',
+        }
+    
+    def _factuur_bundel(self, hashes):
+        """Samengevoegde PDF van de facturen, hergebruikt zolang selectie en facturen gelijk blijven
+
+        Een bundel zonder record mag enkel zijn maker downloaden, dus elke gebruiker krijgt een eigen bundel.
+        """
+        Attachment = self.env['ir.attachment'].sudo()
+        sleutel = hashlib.sha256(json.dumps(
+            [self.env.uid, [[verkoop.id, hashes[verkoop.id]] for verkoop in self]]
+        ).encode()).hexdigest()
+        naam = f"Facturen_{sleutel[:16]}.pdf"
+        bundel = Attachment.search([
+            ('res_model', '=', self._name), ('res_id', '=', 0), ('name', '=', naam),
+            ('create_uid', '=', self.env.uid),
+        ], limit=1)
+        if bundel:
+            return bundel
+        # Oude bundels opruimen, de afzonderlijke facturen blijven bewaard
+        Attachment.search([
+            ('res_model', '=', self._name), ('res_id', '=', 0), ('name', '=like', 'Facturen_%'),
+            ('create_date', '<', fields.Datetime.now() - timedelta(days=1)),
+        ]).unlink()
+        return Attachment.create({
+            'name': naam,
+            'raw': merge_pdf([verkoop.factuur_attachment_id.raw for verkoop in self]),
+            'mimetype': 'application/pdf',
+            'res_model': self._name,
+            'res_id': 0,
+        })
+    
+    @api.model
+    def _cron_render_facturen(self):
+        """Render de facturen in de wachtrij, met een commit per batch"""
+        while True:
+            verkopen = self.search([('factuur_in_wachtrij', '=', True)], limit=FACTUUR_BATCH)
+            if not verkopen:
+                break
+            hashes = {verkoop.id: verkoop._factuur_hash() for verkoop in verkopen}
+            verkopen._verouderde_facturen(hashes)._render_factuur_batch(hashes)
+            verkopen._zet_factuur_in_wachtrij(False)
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+    
+    def _factuur_hash(self):
+        """Hash van alle velden die op de factuur staan"""
+        self.ensure_one()
+        partner = self.partner_id
+        inhoud = [
+            self.name, str(self.verkoop_datum), self.aantal, self.prijs_per_stuk,
+            self.korting_percentage, self.korting_bedrag, self.subtotaal, self.totaal_bedrag,
+            self.betaal_methode, self.opmerkingen,
+            self.koek_id.name_koek, self.koek_id.categorie_koek_id.name, self.koek_id.tags_ids.mapped('name'),
+            partner.name, partner.email, partner.phone, partner.street, partner.zip, partner.city,
+            partner.country_id.name,
+            # Wijzigingen aan logo of document layout van het bedrijf
+            self.env.company.id, str(self.env.company.write_date),
+        ]
+        return hashlib.sha256(json.dumps(inhoud, default=str).encode()).hexdigest()
+    
+    def _render_facturen(self):
+        """Geef per verkoop de factuur PDF als attachment, render enkel wat gewijzigd is"""
+        hashes = {verkoop.id: verkoop._factuur_hash() for verkoop in self}
+        te_renderen = self._verouderde_facturen(hashes)
+        for start in range(0, len(te_renderen), FACTUUR_BATCH):
+            te_renderen[start:start + FACTUUR_BATCH]._render_factuur_batch(hashes)
+        return {verkoop.id: verkoop.factuur_attachment_id for verkoop in self}
+    
+    def _verouderde_facturen(self, hashes):
+        """Verkopen zonder factuur of met een factuur die niet meer klopt"""
+        return self.filtered(lambda v: not v.factuur_attachment_id or v.factuur_hash != hashes[v.id])
+    
+    def _render_factuur_batch(self, hashes):
+        """Render een batch facturen met één wkhtmltopdf aanroep"""
+        report = self.env.ref('Bakker.report_bakker_factuur')
+        streams = report._render_qweb_pdf_prepare_streams(report.report_name, {}, res_ids=self.ids)
+        if False in streams:
+            # PDF kon niet per verkoop gesplitst worden, render dan apart
+            pdfs = {verkoop.id: report._render_qweb_pdf(report.report_name, [verkoop.id])[0] for verkoop in self}
+        else:
+            pdfs = {res_id: data['stream'].getvalue() for res_id, data in streams.items()}
+        
+        oude_attachments = self.factuur_attachment_id
+        attachments = self.env['ir.attachment'].sudo().create([{
+            'name': f"Factuur_{verkoop.name}.pdf",
+            'raw': pdfs[verkoop.id],
+            'mimetype': 'application/pdf',
+            'res_model': self._name,
+            'res_id': verkoop.id,
+        } for verkoop in self])
+        # Met SQL zodat write_date niet verandert, zie _zet_factuur_in_wachtrij
+        self.flush_recordset(['factuur_hash', 'factuur_attachment_id'])
+        self.env.cr.execute("""
+            UPDATE bakker_verkoop v
+               SET factuur_hash = d.hash, factuur_attachment_id = d.attachment_id
+              FROM unnest(%s::int[], %s::varchar[], %s::int[]) AS d(id, hash, attachment_id)
+             WHERE v.id = d.id
+        """, [self.ids, [hashes[verkoop_id] for verkoop_id in self.ids], attachments.ids])
+        self.invalidate_recordset(['factuur_hash', 'factuur_attachment_id'])
+        oude_attachments.sudo().unlink()
+    
+    def _zet_factuur_in_wachtrij(self, waarde):
+        """Zet de wachtrij vlag zonder write_date aan te passen
+
+        Een gerenderde factuur is geen wijziging aan de verkoop: een ORM write zou de verkopen
+        opnieuw in de incrementele export, de rapport verversing en de dashboard sleutel brengen.
+        """
+        self.flush_recordset(['factuur_in_wachtrij'])
+        self.env.cr.execute(
+            "UPDATE bakker_verkoop SET factuur_in_wachtrij = %s WHERE id = ANY(%s)", [waarde, self.ids],
+        )
+        self.invalidate_recordset(['factuur_in_wachtrij'])
+    
     def action_open_print_wizard(self):
         """Open standaard print wizard voor factuur"""
         return {
@@ -239,23 +630,24 @@ class BakkerVerkoopWizard(models.TransientModel):
             if record.aantal > record.koek_id.voorraad_koek:
                 raise ValidationError(f"Niet genoeg voorraad! Beschikbaar: {record.koek_id.voorraad_koek}")
     
+    @gemeten
     def action_verkoop(self):
         """Voer de verkoop uit"""
-        verkoop = self.env['bakker_verkoop'].create({
+        vals = {
             'koek_id': self.koek_id.id,
             'partner_id': self.partner_id.id,
             'aantal': self.aantal,
             'prijs_per_stuk': self.finale_prijs,
             'korting_percentage': self.korting_percentage,
             'betaal_methode': self.betaal_methode,
-        })
-        
-        # Bevestig verkoop
-        verkoop.action_bevestig_verkoop()
+        }
         
-        # Markeer als betaald indien gewenst
         if self.direct_betaald:
-            verkoop.action_markeer_betaald()
+            # Maak, bevestig en betaal in één keer
+            verkoop = self.env['bakker_verkoop'].create_and_settle_batch([vals])
+        else:
+            verkoop = self.env['bakker_verkoop'].create(vals)
+            verkoop.action_bevestig_verkoop()
         
         return {
             'name': 'Nieuwe Verkoop',
@@ -282,17 +674,16 @@ class BakkerFactuurWizard(models.TransientModel):
     _description = 'Factuur Preview Wizard'
     
     verkoop_id = fields.Many2one('bakker_verkoop', string='Verkoop', required=True)
-    pdf_data = fields.Binary(string='PDF Data')
-    pdf_filename = fields.Char(string='Filename')
+    attachment_id = fields.Many2one('ir.attachment', string='Factuur PDF')
+    pdf_data = fields.Binary(string='PDF Data', related='attachment_id.datas')
+    pdf_filename = fields.Char(string='Filename', related='attachment_id.name')
     show_preview = fields.Boolean(string='Toon Preview', default=True)
     
+    @gemeten
     def action_preview_factuur(self):
         """Genereer PDF preview"""
-        report = self.env.ref('Bakker.report_bakker_factuur')
-        pdf_content, _ = report._render_qweb_pdf([self.verkoop_id.id])
-        
-        self.pdf_data = base64.b64encode(pdf_content)
-        self.pdf_filename = f"Factuur_{self.verkoop_id.name}.pdf"
+        # Hergebruik de bewaarde factuur als er niets gewijzigd is
+        self.attachment_id = self.verkoop_id._render_facturen()[self.verkoop_id.id]
         self.show_preview = True
         
         return {
@@ -307,22 +698,22 @@ class BakkerFactuurWizard(models.TransientModel):
     
     def action_download_factuur(self):
         """Download de PDF"""
-        if not self.pdf_data:
+        if not self.attachment_id:
             self.action_preview_factuur()
         
         return {
             'type': 'ir.actions.act_url',
-            'url': f'/web/content?model=bakker.factuur.wizard&id={self.id}&field=pdf_data&filename_field=pdf_filename&download=true',
+            'url': f'/web/content/{self.attachment_id.id}?download=true',
             'target': 'self',
         }
     
     def action_print_factuur(self):
         """Print de PDF via browser"""
-        if not self.pdf_data:
+        if not self.attachment_id:
             self.action_preview_factuur()
         
         return {
             'type': 'ir.actions.act_url',
-            'url': f'/web/content?model=bakker.factuur.wizard&id={self.id}&field=pdf_data&filename_field=pdf_filename',
+            'url': f'/web/content/{self.attachment_id.id}',
             'target': 'new',
-        }
\ No newline at end of file
+        }
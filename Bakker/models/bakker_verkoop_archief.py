@@ -0,0 +1,144 @@
+from odoo import models, fields, api
+from odoo.tools.sql import create_index
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Kolommen die ongewijzigd van bakker_verkoop naar het archief gaan
+ARCHIEF_KOLOMMEN = [
+    'name', 'koek_id', 'partner_id', 'aantal', 'prijs_per_stuk', 'korting_percentage',
+    'subtotaal', 'korting_bedrag', 'totaal_bedrag', 'verkoop_datum', 'status', 'betaal_methode',
+    'opmerkingen', 'factuur_attachment_id', 'kassa', 'kassa_sleutel',
+    'create_uid', 'create_date', 'write_uid', 'write_date',
+]
+
+
+class BakkerVerkoopArchief(models.Model):
+    _name = "bakker_verkoop_archief"
+    _description = "Gearchiveerde verkopen"
+    _inherit = ['mail.thread']
+    _order = "verkoop_datum desc, id desc"
+
+    # De bijvulprognose leest een jaar verkoophistoriek uit bakker_verkoop
+    MIN_DAGEN = 366
+
+    origineel_id = fields.Integer(string="Origineel ID", readonly=True, index=True)
+    name = fields.Char(string="Verkoop Nummer", readonly=True)
+    koek_id = fields.Many2one('bakker_koeken', string="Koek", readonly=True, index=True, ondelete='restrict')
+    partner_id = fields.Many2one('res.partner', string="Klant", readonly=True, index=True, ondelete='restrict')
+    aantal = fields.Integer(string="Aantal", readonly=True)
+    prijs_per_stuk = fields.Float(string="Prijs per stuk", readonly=True)
+    korting_percentage = fields.Float(string="Korting (%)", readonly=True)
+    subtotaal = fields.Float(string="Subtotaal", readonly=True)
+    korting_bedrag = fields.Float(string="Korting Bedrag", readonly=True)
+    totaal_bedrag = fields.Float(string="Totaal Bedrag", readonly=True)
+    verkoop_datum = fields.Datetime(string="Verkoop Datum", readonly=True)
+    status = fields.Selection([
+        ('betaald', 'Betaald'),
+        ('geannuleerd', 'Geannuleerd')
+    ], string="Status", readonly=True)
+    betaal_methode = fields.Selection([
+        ('cash', 'Contant'),
+        ('card', 'Bankkaart'),
+        ('digital', 'Digitaal')
+    ], string="Betaal Methode", readonly=True)
+    opmerkingen = fields.Text(string="Opmerkingen", readonly=True)
+    factuur_attachment_id = fields.Many2one('ir.attachment', string="Factuur PDF", readonly=True, ondelete='set null')
+    kassa = fields.Char(string="Kassa", readonly=True)
+    kassa_sleutel = fields.Char(string="Kassa Sleutel", readonly=True)
+    gearchiveerd_op = fields.Datetime(string="Gearchiveerd Op", readonly=True)
+
+    def init(self):
+        # Zelfde sortering als de lijst van de actieve verkopen
+        create_index(self.env.cr, 'bakker_verkoop_archief_verkoop_datum_idx', self._table, ['verkoop_datum DESC', 'id DESC'])
+        # Betaalde verkopen per koek voor de stats reconciliatie
+        create_index(self.env.cr, 'bakker_verkoop_archief_betaald_koek_idx', self._table, ['koek_id', 'aantal', 'totaal_bedrag'], where="status = 'betaald'")
+
+    @api.model
+    def _cron_archiveer_verkopen(self, batch_size=5000):
+        """Verplaats afgesloten verkopen ouder dan de bewaartermijn naar het archief"""
+        dagen = int(self.env['ir.config_parameter'].sudo().get_param('Bakker.verkoop_archief_dagen', 730))
+        grens = fields.Datetime.now() - timedelta(days=max(dagen, self.MIN_DAGEN))
+        totaal = 0
+        while True:
+            aantal = self._archiveer_batch(grens, batch_size)
+            totaal += aantal
+            if aantal < batch_size:
+                break
+            # Commit per batch zodat de locks op bakker_verkoop kort blijven
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+        _logger.info("Verkoop archief: %s verkopen van voor %s gearchiveerd", totaal, grens)
+        return totaal
+
+    @api.model
+    def _archiveer_batch(self, grens, batch_size):
+        """Verplaats één batch betaalde en geannuleerde verkopen van voor ``grens``
+
+        De rijen worden met SQL verplaatst, buiten bakker_verkoop.unlink om:
+        totaal_verkocht en totaal_omzet op de koeken blijven dus ongewijzigd.
+        Chatter, volgers en bijlagen (facturen) verhuizen mee naar het archief.
+
+        :return: aantal verplaatste verkopen
+        """
+        self.env['bakker_verkoop'].flush_model()
+        cr = self.env.cr
+        kolommen = ", ".join(ARCHIEF_KOLOMMEN)
+        cr.execute(f"""
+            WITH te_verplaatsen AS (
+                SELECT id
+                  FROM bakker_verkoop
+                 WHERE status IN ('betaald', 'geannuleerd') AND verkoop_datum < %s
+              ORDER BY verkoop_datum, id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+            ), verplaatst AS (
+                DELETE FROM bakker_verkoop v
+                 USING te_verplaatsen t
+                 WHERE v.id = t.id
+             RETURNING v.*
+            )
+            INSERT INTO bakker_verkoop_archief (origineel_id, {kolommen}, gearchiveerd_op)
+            SELECT id, {kolommen}, now() AT TIME ZONE 'UTC'
+              FROM verplaatst
+         RETURNING origineel_id, id
+        """, [grens, batch_size])
+        paren = cr.fetchall()
+        if not paren:
+            return 0
+
+        oude_ids, nieuwe_ids = [list(kolom) for kolom in zip(*paren)]
+        cr.execute("""
+            UPDATE mail_message m
+               SET model = %s, res_id = d.nieuw
+              FROM unnest(%s::int[], %s::int[]) AS d(oud, nieuw)
+             WHERE m.model = 'bakker_verkoop' AND m.res_id = d.oud
+        """, [self._name, oude_ids, nieuwe_ids])
+        cr.execute("""
+            UPDATE mail_followers f
+               SET res_model = %s, res_id = d.nieuw
+              FROM unnest(%s::int[], %s::int[]) AS d(oud, nieuw)
+             WHERE f.res_model = 'bakker_verkoop' AND f.res_id = d.oud
+        """, [self._name, oude_ids, nieuwe_ids])
+        cr.execute("""
+            UPDATE ir_attachment a
+               SET res_model = %s, res_id = d.nieuw
+              FROM unnest(%s::int[], %s::int[]) AS d(oud, nieuw)
+             WHERE a.res_model = 'bakker_verkoop' AND a.res_id = d.oud
+        """, [self._name, oude_ids, nieuwe_ids])
+        # Openstaande activiteiten op afgesloten verkopen zijn niet meer relevant
+        cr.execute(
+            "DELETE FROM mail_activity WHERE res_model = 'bakker_verkoop' AND res_id = ANY(%s)", [oude_ids],
+        )
+        self.env.invalidate_all()
+        return len(paren)
+
+    def action_download_factuur(self):
+        """Download de bewaarde factuur PDF"""
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/web/content/{self.factuur_attachment_id.id}?download=true',
+            'target': 'self',
+        }
@@ -0,0 +1,216 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from datetime import timedelta
+import csv
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+_logger = logging.getLogger(__name__)
+
+# Kolommen van de export, in volgorde
+EXPORT_KOLOMMEN = [
+    'id', 'name', 'verkoop_datum', 'koek', 'categorie', 'klant', 'klant_email',
+    'aantal', 'prijs_per_stuk', 'korting_percentage', 'korting_bedrag', 'totaal_bedrag',
+    'betaal_methode', 'status', 'write_date',
+]
+
+# Vast schema, zodat een lege kolom in de eerste chunk geen verkeerd type oplevert
+PARQUET_SCHEMA = pyarrow.schema([
+    ('id', pyarrow.int64()),
+    ('name', pyarrow.string()),
+    ('verkoop_datum', pyarrow.timestamp('us')),
+    ('koek', pyarrow.string()),
+    ('categorie', pyarrow.string()),
+    ('klant', pyarrow.string()),
+    ('klant_email', pyarrow.string()),
+    ('aantal', pyarrow.int64()),
+    ('prijs_per_stuk', pyarrow.float64()),
+    ('korting_percentage', pyarrow.float64()),
+    ('korting_bedrag', pyarrow.float64()),
+    ('totaal_bedrag', pyarrow.float64()),
+    ('betaal_methode', pyarrow.string()),
+    ('status', pyarrow.string()),
+    ('write_date', pyarrow.timestamp('us')),
+]) if pyarrow else None
+
+
+class BakkerVerkoopExport(models.Model):
+    _name = "bakker_verkoop_export"
+    _description = "Export van verkopen voor de boekhouding"
+    _order = "create_date desc"
+
+    CHUNK = 5000
+    # Bytes per lees- en schrijfoperatie bij het kopiëren naar de filestore
+    BLOK_GROOTTE = 1024 * 1024
+    # Zelfde marge als het verkoop rapport: write_date is het begin van de schrijvende
+    # transactie, verkopen die later committen komen in de volgende export
+    VEILIGHEIDSMARGE = timedelta(minutes=10)
+
+    name = fields.Char(string="Naam", required=True, default=lambda self: f"Verkopen {fields.Date.today()}")
+    formaat = fields.Selection([
+        ('csv', 'CSV'),
+        ('parquet', 'Parquet')
+    ], string="Formaat", required=True, default='csv')
+    incrementeel = fields.Boolean(string="Incrementeel", default=True, help="Enkel verkopen gewijzigd sinds de vorige export")
+    status = fields.Selection([
+        ('nieuw', 'Nieuw'),
+        ('klaar', 'Klaar')
+    ], string="Status", default='nieuw', readonly=True)
+    vanaf = fields.Datetime(string="Gewijzigd na", readonly=True)
+    watermark = fields.Datetime(string="Gewijzigd tot", readonly=True, help="Verkopen gewijzigd tot dit moment zitten in deze export")
+    aantal_rijen = fields.Integer(string="Aantal Rijen", readonly=True)
+    attachment_id = fields.Many2one('ir.attachment', string="Bestand", readonly=True)
+
+    @api.model
+    def _cron_exporteer_verkopen(self):
+        """Dagelijkse incrementele CSV export"""
+        self.create({'formaat': 'csv', 'incrementeel': True}).action_exporteer()
+
+    def action_exporteer(self):
+        """Schrijf de verkopen in stukken weg naar een bestand"""
+        for export in self:
+            if export.formaat == 'parquet' and pyarrow is None:
+                raise UserError("Parquet export vereist de Python bibliotheek pyarrow.")
+            export._exporteer()
+        return True
+
+    def action_download(self):
+        """Download het export bestand"""
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/web/content/{self.attachment_id.id}?download=true',
+            'target': 'self',
+        }
+
+    def _exporteer(self):
+        self.ensure_one()
+        vanaf = False
+        if self.incrementeel:
+            vorige = self.search([('status', '=', 'klaar'), ('id', '!=', self.id)], order='watermark desc', limit=1)
+            vanaf = vorige.watermark
+        watermark = self.env.cr.now() - self.VEILIGHEIDSMARGE
+        self.env['bakker_verkoop'].flush_model()
+
+        with tempfile.NamedTemporaryFile(suffix=f'.{self.formaat}', delete=False) as bestand:
+            pad = bestand.name
+        try:
+            if self.formaat == 'csv':
+                aantal = self._schrijf_csv(pad, vanaf, watermark)
+            else:
+                aantal = self._schrijf_parquet(pad, vanaf, watermark)
+            attachment = self._maak_attachment(pad, f"{self.name}.{self.formaat}")
+        finally:
+            os.unlink(pad)
+
+        self.write({
+            'status': 'klaar',
+            'vanaf': vanaf,
+            'watermark': watermark,
+            'aantal_rijen': aantal,
+            'attachment_id': attachment.id,
+        })
+        _logger.info("Verkoop export %s: %s rijen", self.name, aantal)
+
+    def _lees_chunks(self, vanaf, tot):
+        """Lees de verkopen gewijzigd in (vanaf, tot] per CHUNK rijen, gepagineerd op id zodat het geheugen constant blijft
+
+        Een volledige export (zonder ``vanaf``) bevat ook het archief, met het originele id.
+        Incrementeel is dat niet nodig: gearchiveerde verkopen zijn geëxporteerd toen ze nog actief waren.
+        """
+        kolommen = """name, verkoop_datum, koek_id, partner_id, aantal, prijs_per_stuk, korting_percentage,
+                      korting_bedrag, totaal_bedrag, betaal_methode, status, write_date"""
+        bron = f"SELECT id, {kolommen} FROM bakker_verkoop"
+        if not vanaf:
+            bron += f" UNION ALL SELECT origineel_id AS id, {kolommen} FROM bakker_verkoop_archief"
+        laatste_id = 0
+        while True:
+            self.env.cr.execute(f"""
+                SELECT v.id, v.name, v.verkoop_datum, k.name_koek, c.name, p.name, p.email,
+                       v.aantal, v.prijs_per_stuk, v.korting_percentage, v.korting_bedrag, v.totaal_bedrag,
+                       v.betaal_methode, v.status, v.write_date
+                  FROM ({bron}) v
+                  JOIN bakker_koeken k ON k.id = v.koek_id
+             LEFT JOIN bakker_koeken_categorie c ON c.id = k.categorie_koek_id
+                  JOIN res_partner p ON p.id = v.partner_id
+                 WHERE v.id > %s AND (%s::timestamp IS NULL OR v.write_date > %s) AND v.write_date <= %s
+              ORDER BY v.id
+                 LIMIT %s
+            """, [laatste_id, vanaf or None, vanaf or None, tot, self.CHUNK])
+            rijen = self.env.cr.fetchall()
+            if not rijen:
+                return
+            laatste_id = rijen[-1][0]
+            yield rijen
+
+    def _schrijf_csv(self, pad, vanaf, tot):
+        aantal = 0
+        with open(pad, 'w', newline='', encoding='utf-8') as bestand:
+            writer = csv.writer(bestand)
+            writer.writerow(EXPORT_KOLOMMEN)
+            for rijen in self._lees_chunks(vanaf, tot):
+                writer.writerows(rijen)
+                aantal += len(rijen)
+        return aantal
+
+    def _schrijf_parquet(self, pad, vanaf, tot):
+        aantal = 0
+        with pyarrow.parquet.ParquetWriter(pad, PARQUET_SCHEMA) as writer:
+            for rijen in self._lees_chunks(vanaf, tot):
+                kolommen = list(zip(*rijen))
+                writer.write_table(pyarrow.table(
+                    {naam: list(waarden) for naam, waarden in zip(EXPORT_KOLOMMEN, kolommen)},
+                    schema=PARQUET_SCHEMA,
+                ))
+                aantal += len(rijen)
+        return aantal
+
+    def _maak_attachment(self, pad, naam):
+        """Maak een attachment van het bestand, in de transactie van de export
+
+        Het bestand gaat in blokken naar de filestore in plaats van volledig in het geheugen
+        via ``raw``. Zoals in ``ir.attachment._file_write`` ruimt de garbage collector het
+        bestand op als de transactie terugdraait. Als binair bestand wordt het niet geïndexeerd.
+        """
+        Attachment = self.env['ir.attachment'].sudo()
+        vals = {
+            'name': naam,
+            'mimetype': 'application/octet-stream',
+            'res_model': self._name,
+            'res_id': self.id,
+        }
+        if Attachment._storage() != 'file':
+            # Opslag in de database kan enkel via raw
+            with open(pad, 'rb') as bestand:
+                return Attachment.create(dict(vals, raw=bestand.read()))
+
+        sha = hashlib.sha1()
+        with open(pad, 'rb') as bestand:
+            for blok in iter(lambda: bestand.read(self.BLOK_GROOTTE), b''):
+                sha.update(blok)
+        checksum = sha.hexdigest()
+        store_fname = f"{checksum[:2]}/{checksum}"
+        volledig_pad = Attachment._full_path(store_fname)
+        if not os.path.exists(volledig_pad):
+            os.makedirs(os.path.dirname(volledig_pad), exist_ok=True)
+            with open(pad, 'rb') as bron, open(volledig_pad, 'wb') as doel:
+                shutil.copyfileobj(bron, doel, self.BLOK_GROOTTE)
+            Attachment._mark_for_gc(store_fname)
+
+        # create() negeert store_fname, checksum en file_size, die volgen uit raw
+        attachment = Attachment.create(vals)
+        self.env.cr.execute(
+            "UPDATE ir_attachment SET store_fname = %s, checksum = %s, file_size = %s WHERE id = %s",
+            [store_fname, checksum, os.path.getsize(pad), attachment.id],
+        )
+        attachment.invalidate_recordset(['store_fname', 'checksum', 'file_size'])
+        return attachment
@@ -0,0 +1,139 @@
+from odoo import models, fields, api
+from odoo.tools.sql import create_index
+from datetime import timedelta
+
+
+class BakkerVerkoopRapport(models.Model):
+    _name = "bakker_verkoop_rapport"
+    _description = "Dagelijkse verkoopcijfers per koek"
+    _order = "datum desc"
+    _rec_name = "datum"
+
+    WATERMARK_PARAM = 'Bakker.verkoop_rapport_watermark'
+    # write_date is het begin van de schrijvende transactie, die pas later kan committen.
+    # Elke run kijkt daarom zo ver terug, dubbel verversen is onschuldig.
+    VEILIGHEIDSMARGE = timedelta(minutes=10)
+
+    datum = fields.Date(string="Datum", readonly=True, index=True)
+    koek_id = fields.Many2one('bakker_koeken', string="Koek", readonly=True, index=True, ondelete='cascade')
+    categorie_koek_id = fields.Many2one('bakker_koeken_categorie', string="Categorie", readonly=True)
+    tags_ids = fields.Many2many('bakker_koeken_tags', 'bakker_verkoop_rapport_tags_rel', 'rapport_id', 'tag_id', string="Tags", readonly=True)
+    betaal_methode = fields.Selection([
+        ('cash', 'Contant'),
+        ('card', 'Bankkaart'),
+        ('digital', 'Digitaal')
+    ], string="Betaal Methode", readonly=True)
+    status = fields.Selection([
+        ('concept', 'Concept'),
+        ('bevestigd', 'Bevestigd'),
+        ('betaald', 'Betaald'),
+        ('geannuleerd', 'Geannuleerd')
+    ], string="Status", readonly=True)
+    aantal_verkopen = fields.Integer(string="Aantal Verkopen", readonly=True)
+    aantal = fields.Integer(string="Aantal Koeken", readonly=True)
+    omzet = fields.Float(string="Omzet", readonly=True)
+
+    def init(self):
+        create_index(self.env.cr, 'bakker_verkoop_rapport_datum_categorie_idx', self._table, ['datum', 'categorie_koek_id'])
+        create_index(self.env.cr, 'bakker_verkoop_rapport_tags_rel_tag_idx', 'bakker_verkoop_rapport_tags_rel', ['tag_id'])
+
+    @api.model
+    def _cron_ververs_rapport(self):
+        """Ververs alleen de dagen met gewijzigde verkopen sinds de vorige run
+
+        Zonder watermark (eerste run, of parameter verwijderd) wordt alles opnieuw opgebouwd.
+        """
+        params = self.env['ir.config_parameter'].sudo()
+        watermark = params.get_param(self.WATERMARK_PARAM)
+        # Begin van deze transactie, min de marge voor verkopen die nog niet gecommit zijn
+        nieuwe_watermark = fields.Datetime.to_string(self.env.cr.now() - self.VEILIGHEIDSMARGE)
+
+        self.env['bakker_verkoop'].flush_model()
+        if watermark:
+            self.env.cr.execute(
+                "SELECT DISTINCT verkoop_datum::date FROM bakker_verkoop WHERE write_date > %s",
+                [watermark],
+            )
+            self._ververs_dagen([dag for dag, in self.env.cr.fetchall()])
+        else:
+            self._ververs_dagen()
+
+        params.set_param(self.WATERMARK_PARAM, nieuwe_watermark)
+
+    @api.model
+    def _ververs_dagen(self, dagen=None):
+        """Bouw de rapportregels opnieuw op voor de gegeven dagen, of alles indien None"""
+        if dagen is not None and not dagen:
+            return
+        cr = self.env.cr
+        if dagen is None:
+            cr.execute("DELETE FROM bakker_verkoop_rapport")
+            filter_sql, params = "", []
+        else:
+            cr.execute("DELETE FROM bakker_verkoop_rapport WHERE datum = ANY(%s)", [dagen])
+            # Bereik eerst zodat de index op verkoop_datum gebruikt kan worden
+            filter_sql = """
+                WHERE v.verkoop_datum >= %s AND v.verkoop_datum < %s::date + 1
+                  AND v.verkoop_datum::date = ANY(%s)
+            """
+            params = [min(dagen), max(dagen), dagen]
+
+        cr.execute(f"""
+            INSERT INTO bakker_verkoop_rapport (
+                datum, koek_id, categorie_koek_id, betaal_methode, status,
+                aantal_verkopen, aantal, omzet,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT v.verkoop_datum::date, v.koek_id, k.categorie_koek_id, v.betaal_methode, v.status,
+                   COUNT(*), SUM(v.aantal), SUM(v.totaal_bedrag),
+                   %s, now() AT TIME ZONE 'UTC', %s, now() AT TIME ZONE 'UTC'
+              FROM (SELECT verkoop_datum, koek_id, betaal_methode, status, aantal, totaal_bedrag
+                      FROM bakker_verkoop
+                     UNION ALL
+                    -- Gearchiveerde verkopen blijven in het rapport
+                    SELECT verkoop_datum, koek_id, betaal_methode, status, aantal, totaal_bedrag
+                      FROM bakker_verkoop_archief) v
+              JOIN bakker_koeken k ON k.id = v.koek_id
+              {filter_sql}
+          GROUP BY v.verkoop_datum::date, v.koek_id, k.categorie_koek_id, v.betaal_methode, v.status
+         RETURNING id
+        """, [self.env.uid, self.env.uid] + params)
+        rapport_ids = [rapport_id for rapport_id, in cr.fetchall()]
+
+        if rapport_ids:
+            cr.execute("""
+                INSERT INTO bakker_verkoop_rapport_tags_rel (rapport_id, tag_id)
+                SELECT r.id, rel.bakker_koeken_tags_id
+                  FROM bakker_verkoop_rapport r
+                  JOIN bakker_koeken_bakker_koeken_tags_rel rel ON rel.bakker_koeken_id = r.koek_id
+                 WHERE r.id = ANY(%s)
+            """, [rapport_ids])
+        self.env.invalidate_all()
+
+    @api.model
+    def _ververs_koeken(self, koek_ids):
+        """Neem een nieuwe categorie of tags van koeken over in hun bestaande rapportregels"""
+        if not koek_ids:
+            return
+        self.env['bakker_koeken'].flush_model(['categorie_koek_id', 'tags_ids'])
+        cr = self.env.cr
+        cr.execute("""
+            UPDATE bakker_verkoop_rapport r
+               SET categorie_koek_id = k.categorie_koek_id
+              FROM bakker_koeken k
+             WHERE r.koek_id = k.id AND k.id = ANY(%s)
+               AND r.categorie_koek_id IS DISTINCT FROM k.categorie_koek_id
+        """, [list(koek_ids)])
+        cr.execute("""
+            DELETE FROM bakker_verkoop_rapport_tags_rel rel
+             USING bakker_verkoop_rapport r
+             WHERE rel.rapport_id = r.id AND r.koek_id = ANY(%s)
+        """, [list(koek_ids)])
+        cr.execute("""
+            INSERT INTO bakker_verkoop_rapport_tags_rel (rapport_id, tag_id)
+            SELECT r.id, rel.bakker_koeken_tags_id
+              FROM bakker_verkoop_rapport r
+              JOIN bakker_koeken_bakker_koeken_tags_rel rel ON rel.bakker_koeken_id = r.koek_id
+             WHERE r.koek_id = ANY(%s)
+        """, [list(koek_ids)])
+        self.env.invalidate_all()
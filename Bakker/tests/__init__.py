@@ -0,0 +1,7 @@
+from . import test_performance
+from . import test_verkoop
+from . import test_verkoop_rapport
+from . import test_koeken_batch
+from . import test_verkoop_export
+from . import test_koeken_import
+from . import test_factuur_wachtrij
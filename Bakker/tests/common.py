@@ -0,0 +1,248 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from odoo import SUPERUSER_ID, api, fields
+from odoo.modules.registry import Registry
+from odoo.tests.common import BaseCase, TransactionCase, get_db_name
+
+_logger = logging.getLogger(__name__)
+
+# Standaard een kleine dataset zodat de tests in CI snel blijven. Voor een
+# volledige run: BAKKER_PERF_KOEKEN=100000 BAKKER_PERF_VERKOPEN=1000000
+AANTAL_KOEKEN = int(os.environ.get('BAKKER_PERF_KOEKEN', 1000))
+AANTAL_VERKOPEN = int(os.environ.get('BAKKER_PERF_VERKOPEN', 10000))
+# Volledige kassa load test: BAKKER_PERF_KASSA_VERKOPEN=50000
+AANTAL_KASSA_VERKOPEN = int(os.environ.get('BAKKER_PERF_KASSA_VERKOPEN', 2000))
+# Snelle verkopen in de load test aan 50 per seconde, volledig: BAKKER_PERF_SNELLE_VERKOPEN=5000
+AANTAL_SNELLE_VERKOPEN = int(os.environ.get('BAKKER_PERF_SNELLE_VERKOPEN', 500))
+# Tot hoeveel verkopen de create latency gemeten wordt, volledig: BAKKER_PERF_CREATE_TOT=1000000
+CREATE_TOT = int(os.environ.get('BAKKER_PERF_CREATE_TOT', 100000))
+RAPPORT_PAD = os.environ.get('BAKKER_PERF_RAPPORT', os.path.join(tempfile.gettempdir(), 'bakker_perf.json'))
+
+
+class BakkerCase(TransactionCase):
+    """Basis voor de functionele tests: één categorie, twee koeken en een klant"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.categorie = cls.env['bakker_koeken_categorie'].create({'name': 'Test Categorie'})
+        cls.koek = cls.env['bakker_koeken'].create({
+            'name_koek': 'Test Koek',
+            'prijs_koek': 2.5,
+            'voorraad_koek': 50,
+            'categorie_koek_id': cls.categorie.id,
+        })
+        cls.andere_koek = cls.env['bakker_koeken'].create({
+            'name_koek': 'Andere Test Koek',
+            'prijs_koek': 4.0,
+            'voorraad_koek': 10,
+            'categorie_koek_id': cls.categorie.id,
+        })
+        cls.klant = cls.env['res.partner'].create({'name': 'Test Klant', 'email': 'test@bakkerij.local'})
+
+    @classmethod
+    def _verkoop_vals(cls, koek=None, aantal=1, **extra):
+        koek = koek or cls.koek
+        return dict({
+            'koek_id': koek.id,
+            'partner_id': cls.klant.id,
+            'aantal': aantal,
+            'prijs_per_stuk': koek.prijs_koek,
+            'betaal_methode': 'cash',
+        }, **extra)
+
+
+class BakkerPerformanceCase(TransactionCase):
+    """Basis voor de performance tests: seedt een grote dataset met SQL en meet flows"""
+
+    resultaten = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.categorieen = cls.env['bakker_koeken_categorie'].create([
+            {'name': f"Perf Categorie {i}"} for i in range(10)
+        ])
+        cls.tags = cls.env['bakker_koeken_tags'].create([
+            {'name': f"Perf Tag {i}", 'color': i} for i in range(10)
+        ])
+        cls.klant = cls.env['res.partner'].create({'name': 'Perf Klant', 'email': 'perf@bakkerij.local'})
+        cls.env.flush_all()
+
+        start = time.perf_counter()
+        cls._seed_koeken(AANTAL_KOEKEN)
+        cls._seed_verkopen(AANTAL_VERKOPEN)
+        cls.env.cr.execute("""
+            UPDATE bakker_koeken k
+               SET totaal_verkocht = s.aantal, totaal_omzet = s.omzet
+              FROM (SELECT koek_id, SUM(aantal) AS aantal, SUM(totaal_bedrag) AS omzet
+                      FROM bakker_verkoop
+                     WHERE status = 'betaald'
+                  GROUP BY koek_id) s
+             WHERE k.id = s.koek_id
+        """)
+        cls.env['bakker_verkoop_rapport']._ververs_dagen()
+        cls.env.invalidate_all()
+        _logger.info(
+            "Bakker perf dataset: %s koeken, %s verkopen in %.1fs",
+            AANTAL_KOEKEN, AANTAL_VERKOPEN, time.perf_counter() - start,
+        )
+
+        cls.koek = cls.env['bakker_koeken'].search([('name_koek', '=like', 'Perf Koek %')], limit=1)
+
+    @classmethod
+    def _seed_koeken(cls, aantal):
+        """Koeken, hun tags en een startbatch in drie INSERT ... SELECT statements"""
+        cr = cls.env.cr
+        cr.execute("""
+            INSERT INTO bakker_koeken (
+                name_koek, prijs_koek, voorraad_koek, vervaldatum_koek, aankoopdatum_koek,
+                categorie_koek_id, pudding_koek, totaal_inventarisatie, totaal_verkocht, totaal_omzet,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT 'Perf Koek ' || i, 1 + (i %% 50) / 10.0, 1000000, CURRENT_DATE + 30, CURRENT_DATE,
+                   (%s::int[])[1 + i %% 10], i %% 7 = 0, (1 + (i %% 50) / 10.0) * 1000000, 0, 0,
+                   %s, now() AT TIME ZONE 'UTC', %s, now() AT TIME ZONE 'UTC'
+              FROM generate_series(1, %s) AS i
+        """, [cls.categorieen.ids, cls.env.uid, cls.env.uid, aantal])
+        cr.execute("""
+            INSERT INTO bakker_koeken_bakker_koeken_tags_rel (bakker_koeken_id, bakker_koeken_tags_id)
+            SELECT k.id, (%s::int[])[1 + k.id %% 10]
+              FROM bakker_koeken k
+             WHERE k.name_koek LIKE 'Perf Koek %%'
+        """, [cls.tags.ids])
+        cr.execute("""
+            INSERT INTO bakker_koeken_batch (
+                koek_id, aantal, resterend, productiedatum, vervaldatum,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT k.id, k.voorraad_koek, k.voorraad_koek, k.aankoopdatum_koek, k.vervaldatum_koek,
+                   %s, now() AT TIME ZONE 'UTC', %s, now() AT TIME ZONE 'UTC'
+              FROM bakker_koeken k
+             WHERE k.name_koek LIKE 'Perf Koek %%'
+        """, [cls.env.uid, cls.env.uid])
+
+    @classmethod
+    def _seed_verkopen(cls, aantal):
+        """Verkopen over het voorbije jaar, verdeeld over alle koeken en statussen"""
+        cls.env.cr.execute("""
+            WITH koeken AS (
+                SELECT array_agg(id ORDER BY id) AS ids, count(*) AS n
+                  FROM bakker_koeken
+                 WHERE name_koek LIKE 'Perf Koek %%'
+            )
+            INSERT INTO bakker_verkoop (
+                name, koek_id, partner_id, aantal, prijs_per_stuk, korting_percentage,
+                subtotaal, korting_bedrag, totaal_bedrag, verkoop_datum, status, betaal_methode,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT 'PERF-' || i, koeken.ids[1 + i %% koeken.n], %s, 1 + i %% 5, 2.5, 0,
+                   2.5 * (1 + i %% 5), 0, 2.5 * (1 + i %% 5),
+                   (now() AT TIME ZONE 'UTC') - (i %% 365) * interval '1 day',
+                   (ARRAY['betaald', 'betaald', 'betaald', 'bevestigd', 'geannuleerd'])[1 + i %% 5],
+                   (ARRAY['cash', 'card', 'digital'])[1 + i %% 3],
+                   %s, now() AT TIME ZONE 'UTC', %s, now() AT TIME ZONE 'UTC'
+              FROM generate_series(1, %s) AS i, koeken
+        """, [cls.klant.id, cls.env.uid, cls.env.uid, aantal])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        rapport = {}
+        if os.path.exists(RAPPORT_PAD):
+            with open(RAPPORT_PAD) as bestand:
+                try:
+                    rapport = json.load(bestand)
+                except ValueError:
+                    rapport = {}
+        rapport.update({
+            'datum': fields.Datetime.to_string(fields.Datetime.now()),
+            'koeken': AANTAL_KOEKEN,
+            'verkopen': AANTAL_VERKOPEN,
+        })
+        rapport.setdefault('flows', {}).update(cls.resultaten)
+        with open(RAPPORT_PAD, 'w') as bestand:
+            json.dump(rapport, bestand, indent=2, sort_keys=True)
+        _logger.info("Bakker perf rapport geschreven naar %s", RAPPORT_PAD)
+
+    @contextmanager
+    def meet(self, naam, max_queries, budget):
+        """Meet queries en tijd van een flow, controleer de grenzen en bewaar het resultaat
+
+        De grenzen zijn afgeleid uit de queries van elke flow, met wat marge. Het
+        gemeten aantal staat in het rapport; verscherp een grens op basis daarvan.
+
+        :param max_queries: maximaal aantal SQL queries (assertQueryCount)
+        :param budget: maximale duur in seconden
+        """
+        self.env.flush_all()
+        self.env.invalidate_all()
+        queries_voor = self.cr.sql_log_count
+        start = time.perf_counter()
+        with self.assertQueryCount(max_queries):
+            yield
+        duur = time.perf_counter() - start
+        queries = self.cr.sql_log_count - queries_voor
+        type(self).resultaten[naam] = {
+            'queries': queries,
+            'max_queries': max_queries,
+            'seconden': round(duur, 4),
+            'budget': budget,
+        }
+        self.assertLessEqual(duur, budget, f"{naam} duurde {duur:.3f}s, budget is {budget}s")
+
+
+class BakkerGelijktijdigCase(BaseCase):
+    """Basis voor tests met threads die elk een eigen cursor gebruiken
+
+    Geen TransactionCase: in test mode delen alle cursors één verbinding en lopen
+    ze na elkaar. De testdata wordt gecommit en in tearDownClass opgeruimd.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.registry = Registry(get_db_name())
+        with cls.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            cls.categorie_id = env['bakker_koeken_categorie'].create({'name': cls.__name__}).id
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            koeken = env['bakker_koeken'].search([('categorie_koek_id', '=', cls.categorie_id)])
+            env['bakker_verkoop'].search([('koek_id', 'in', koeken.ids)]).unlink()
+            koeken.unlink()
+            env['bakker_koeken_categorie'].browse(cls.categorie_id).unlink()
+        super().tearDownClass()
+
+    @classmethod
+    def _maak_koeken(cls, aantal, voorraad):
+        with cls.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            return env['bakker_koeken'].create([{
+                'name_koek': f"{cls.__name__} {i}",
+                'prijs_koek': 2.0,
+                'voorraad_koek': voorraad,
+                'categorie_koek_id': cls.categorie_id,
+            } for i in range(aantal)]).ids
+
+    def _parallel(self, taken):
+        """Start elke taak in een eigen thread en wacht tot ze klaar zijn
+
+        :return: duur in seconden
+        """
+        threads = [threading.Thread(target=taak) for taak in taken]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
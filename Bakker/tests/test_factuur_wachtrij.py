@@ -0,0 +1,54 @@
+import time
+
+from odoo import fields
+from odoo.tests import tagged
+
+from odoo.addons.base.tests.common import MockSmtplibCase
+
+from .common import BakkerCase
+
+
+@tagged('post_install', '-at_install')
+class TestBakkerFactuurWachtrij(BakkerCase, MockSmtplibCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.koek.voorraad_koek = 1000
+        cls.template = cls.env.ref('Bakker.email_template_bakker_factuur')
+
+    def test_betalen_wacht_niet_op_smtp(self):
+        verkopen = self.env['bakker_verkoop'].create([self._verkoop_vals() for _ in range(500)])
+        verkopen._bevestig()
+        with self.mock_smtplib_connection():
+            start = time.perf_counter()
+            verkopen._betaal()
+            duur = time.perf_counter() - start
+            self.assertFalse(self.emails)
+            self.assertEqual(self.connect_mocked.call_count, 0)
+        self.assertLess(duur, 10, f"500 verkopen betalen duurde {duur:.1f}s")
+        wachtrij = self.env['bakker_factuur_wachtrij'].search([('verkoop_id', 'in', verkopen.ids)])
+        self.assertEqual(len(wachtrij), 500)
+
+        # Eén verkoop die niet rendert blokkeert de rest van de wachtrij niet
+        kapot = verkopen[3]
+        send_mail_batch = type(self.template).send_mail_batch
+
+        def render(template, res_ids, *args, **kwargs):
+            if kapot.id in res_ids:
+                raise ValueError("kapotte factuur")
+            return send_mail_batch(template, res_ids, *args, **kwargs)
+
+        self.patch(type(self.template), 'send_mail_batch', render)
+        with self.mock_smtplib_connection():
+            self.env['bakker_factuur_wachtrij']._cron_verstuur_facturen()
+            self.assertEqual(len(self.emails), 499)
+            # Eén SMTP verbinding per batch van 100
+            self.assertLessEqual(self.connect_mocked.call_count, 5)
+
+        fout = wachtrij.filtered(lambda item: item.verkoop_id == kapot)
+        self.assertEqual(set((wachtrij - fout).mapped('status')), {'verstuurd'})
+        self.assertEqual(fout.status, 'wachtend')
+        self.assertEqual(fout.pogingen, 1)
+        self.assertIn("kapotte factuur", fout.foutmelding)
+        self.assertGreater(fout.volgende_poging, fields.Datetime.now())
@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from odoo.addons.Bakker.models.bakker_bijvul_voorstel import numpy
+from odoo.addons.Bakker.models.bakker_koeken import VERSE_BATCH_SUFFIX
+
+from .common import BakkerCase
+
+
+@tagged('post_install', '-at_install')
+class TestBakkerKoekenBatch(BakkerCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.vandaag = fields.Date.today()
+        # Batch A van 10 vervalt binnen 5 dagen, batch B van 10 binnen 20 dagen
+        cls.fifo_koek = cls.env['bakker_koeken'].create({
+            'name_koek': 'FIFO Koek',
+            'prijs_koek': 1.0,
+            'voorraad_koek': 10,
+            'vervaldatum_koek': cls.vandaag + timedelta(days=5),
+            'categorie_koek_id': cls.categorie.id,
+        })
+        cls.env['bakker_koeken']._voorraad_bijwerken(
+            {cls.fifo_koek.id: 10}, vervaldatum=cls.vandaag + timedelta(days=20),
+        )
+        cls.batch_a, cls.batch_b = cls.fifo_koek.batch_ids.sorted('vervaldatum')
+
+    def test_fifo_verbruik(self):
+        self.env['bakker_koeken']._reserveer_voorraad({self.fifo_koek.id: 12})
+        self.assertEqual(self.batch_a.resterend, 0)
+        self.assertEqual(self.batch_b.resterend, 8)
+        self.assertEqual(self.fifo_koek.voorraad_koek, 8)
+        # De koek vervalt nu met de oudste batch die nog voorraad heeft
+        self.assertEqual(self.fifo_koek.vervaldatum_koek, self.vandaag + timedelta(days=20))
+
+    def test_annuleren_zet_terug_in_verbruikte_batches(self):
+        verkoop = self.env['bakker_verkoop'].create(self._verkoop_vals(koek=self.fifo_koek, aantal=12))
+        verkoop.action_bevestig_verkoop()
+        verkoop.action_annuleer()
+        self.fifo_koek.invalidate_recordset(['batch_ids'])
+        self.assertEqual(self.fifo_koek.voorraad_koek, 20)
+        self.assertEqual(self.batch_a.resterend, 10)
+        self.assertEqual(self.batch_b.resterend, 10)
+        # Geen nieuwe batch met een nieuwe vervaldatum
+        self.assertEqual(self.fifo_koek.batch_ids, self.batch_a | self.batch_b)
+        self.assertEqual(self.fifo_koek.vervaldatum_koek, self.vandaag + timedelta(days=5))
+
+    def test_bijvullen_maakt_nieuwe_batch(self):
+        self.fifo_koek.action_verse_batch()
+        self.fifo_koek.invalidate_recordset(['batch_ids'])
+        nieuw = self.fifo_koek.batch_ids - self.batch_a - self.batch_b
+        self.assertEqual(nieuw.resterend, 30)
+        self.assertEqual(nieuw.vervaldatum, self.vandaag + timedelta(days=30))
+        self.assertEqual(self.fifo_koek.voorraad_koek, 50)
+
+    def test_bijvullen_melding_telt_koeken(self):
+        koeken = self.koek | self.andere_koek
+        melding = koeken.action_voorraad_bijvullen()['params']['message']
+        self.assertEqual(melding, "2 koeken bijgevuld met samen 40 stuks")
+
+    def test_bestelpunt_zonder_historiek(self):
+        if numpy is None:
+            self.skipTest("numpy niet beschikbaar")
+        self.env['bakker_verkoop'].create_and_settle_batch([self._verkoop_vals(aantal=5)])
+        # Het bestelpunt van vroegere verkopen blijft niet staan
+        self.env.flush_all()
+        self.env.cr.execute("UPDATE bakker_koeken SET bestelpunt = 99 WHERE id = %s", [self.andere_koek.id])
+        self.andere_koek.invalidate_recordset(['bestelpunt'])
+        self.env['bakker_bijvul_voorstel']._maak_voorstellen()
+        self.assertEqual(self.andere_koek.bestelpunt, 10)
+
+    def test_vervallen_afschrijven(self):
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE bakker_koeken_batch SET vervaldatum = %s WHERE id = %s",
+            [self.vandaag - timedelta(days=1), self.batch_a.id],
+        )
+        self.env.invalidate_all()
+        self.env['bakker_koeken']._cron_schrijf_vervallen_af()
+        self.assertEqual(self.batch_a.resterend, 0)
+        self.assertEqual(self.batch_b.resterend, 10)
+        self.assertEqual(self.fifo_koek.voorraad_koek, 10)
+        self.assertEqual(self.fifo_koek.vervaldatum_koek, self.vandaag + timedelta(days=20))
+
+    def test_migratie_voegt_enkel_verse_batches_samen(self):
+        Koeken = self.env['bakker_koeken']
+        vals = {'prijs_koek': 3.0, 'voorraad_koek': 5, 'categorie_koek_id': self.categorie.id}
+        origineel = Koeken.create(dict(vals, name_koek='Migratie Koek'))
+        naamgenoot = Koeken.create(dict(vals, name_koek='Migratie Koek'))
+        kopie = Koeken.create(dict(vals, name_koek='Migratie Koek' + VERSE_BATCH_SUFFIX))
+        self.env['bakker_verkoop'].create_and_settle_batch([self._verkoop_vals(koek=kopie, aantal=2)])
+
+        Koeken._migreer_naar_batches()
+        self.assertFalse(kopie.exists())
+        self.assertTrue(naamgenoot.exists())
+        self.assertEqual(naamgenoot.voorraad_koek, 5)
+        self.assertEqual(origineel.voorraad_koek, 8)
+        self.assertEqual(origineel.totaal_verkocht, 2)
+        self.assertEqual(sum(origineel.batch_ids.mapped('resterend')), 8)
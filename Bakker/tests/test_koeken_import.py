@@ -0,0 +1,55 @@
+import base64
+
+from odoo.tests import tagged
+
+from .common import BakkerCase
+
+
+@tagged('post_install', '-at_install')
+class TestBakkerKoekenImport(BakkerCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tag = cls.env['bakker_koeken_tags'].create({'name': 'Import Tag'})
+
+    def _rij(self, naam, **extra):
+        return dict({'name_koek': naam, 'prijs_koek': '1,5', 'voorraad_koek': '4', 'categorie': 'Test Categorie'}, **extra)
+
+    def test_chunks_met_fouten(self):
+        rijen = [
+            self._rij('Import 1', tags='Import Tag'),
+            self._rij('Import 2'),
+            self._rij(''),                                      # rij 4: naam ontbreekt
+            self._rij('Import 3', categorie='Bestaat Niet'),    # rij 5: onbekende categorie
+            self._rij('Import 4'),
+            self._rij('Import \x00 5'),                         # rij 7: weigert de database, de chunk valt terug op rij per rij
+            self._rij('Import 6', prijs_koek='gratis'),         # rij 8: geen getal
+            self._rij('Import 7', pudding_koek='ja'),
+        ]
+        resultaat = self.env['bakker_koeken']._importeer_catalogus(rijen, chunk_size=2)
+        self.assertEqual(resultaat['aangemaakt'], 4)
+        self.assertEqual([rij for rij, _fout in resultaat['fouten']], [4, 5, 7, 8])
+
+        koeken = self.env['bakker_koeken'].search([('name_koek', '=like', 'Import %')])
+        self.assertEqual(sorted(koeken.mapped('name_koek')), ['Import 1', 'Import 2', 'Import 4', 'Import 7'])
+        eerste = koeken.filtered(lambda koek: koek.name_koek == 'Import 1')
+        self.assertEqual(eerste.prijs_koek, 1.5)
+        self.assertEqual(eerste.voorraad_koek, 4)
+        self.assertEqual(eerste.tags_ids, self.tag)
+        self.assertEqual(sum(eerste.batch_ids.mapped('resterend')), 4)
+        self.assertTrue(koeken.filtered(lambda koek: koek.name_koek == 'Import 7').pudding_koek)
+
+    def test_wizard(self):
+        inhoud = "name_koek;prijs_koek;voorraad_koek;categorie;tags\nWizard Koek;2,25;7;Test Categorie;Import Tag\n"
+        wizard = self.env['bakker.koeken.import.wizard'].create({
+            'bestand': base64.b64encode(inhoud.encode('utf-8-sig')),
+            'bestandsnaam': 'koeken.csv',
+        })
+        wizard.action_importeer()
+        self.assertTrue(wizard.klaar)
+        self.assertEqual(wizard.aantal_aangemaakt, 1)
+        self.assertFalse(wizard.fouten)
+        koek = self.env['bakker_koeken'].search([('name_koek', '=', 'Wizard Koek')])
+        self.assertEqual(koek.prijs_koek, 2.25)
+        self.assertEqual(koek.tags_ids, self.tag)
@@ -0,0 +1,507 @@
+import math
+import time
+from datetime import timedelta
+
+from odoo import SUPERUSER_ID, api, fields
+from odoo.exceptions import ValidationError
+from odoo.tests import tagged
+from odoo.tools import SQL
+
+from odoo.addons.Bakker.models.bakker_bijvul_voorstel import numpy
+from odoo.addons.Bakker.models.bakker_koeken import in_eigen_transactie
+
+from .common import AANTAL_KASSA_VERKOPEN, AANTAL_SNELLE_VERKOPEN, AANTAL_VERKOPEN, CREATE_TOT, BakkerGelijktijdigCase, BakkerPerformanceCase
+
+
+@tagged('post_install', '-at_install', '-standard', 'bakker_perf')
+class TestBakkerPerformance(BakkerPerformanceCase):
+
+    def _maak_concept_verkopen(self, aantal):
+        return self.env['bakker_verkoop'].create([self._verkoop_vals() for _ in range(aantal)])
+
+    def _verkoop_vals(self):
+        return {
+            'koek_id': self.koek.id,
+            'partner_id': self.klant.id,
+            'aantal': 1,
+            'prijs_per_stuk': self.koek.prijs_koek,
+            'betaal_methode': 'cash',
+        }
+
+    def _high_volume(self):
+        """Bulk flows zoals de kassa's draaien zonder veldtracking"""
+        self.env['ir.config_parameter'].sudo().set_param('Bakker.verkoop_high_volume', 'True')
+
+    def test_wizard_verkoop(self):
+        wizard = self.env['bakker.verkoop.wizard'].create({
+            'koek_id': self.koek.id,
+            'partner_id': self.klant.id,
+            'aantal': 2,
+            'prijs_per_stuk': self.koek.prijs_koek,
+            'direct_betaald': True,
+        })
+        voorraad = self.koek.voorraad_koek
+        with self.meet('wizard_verkoop', max_queries=60, budget=0.5):
+            wizard.action_verkoop()
+        self.assertEqual(self.koek.voorraad_koek, voorraad - 2)
+
+    def test_snelle_verkoop(self):
+        totaal_verkocht = self.koek.totaal_verkocht
+        with self.meet('snelle_verkoop', max_queries=50, budget=0.2):
+            self.koek.action_snelle_verkoop()
+        self.assertEqual(self.koek.totaal_verkocht, totaal_verkocht + 1)
+
+    def test_create_latentie(self):
+        """Een verkoop aanmaken blijft even snel naarmate de tabel groeit
+
+        Meet 100 creates bij de geseede dataset en telkens na aanvullen tot 10x meer
+        verkopen, tot CREATE_TOT. Start met BAKKER_PERF_VERKOPEN=1000 voor de reeks 1k tot 1M.
+        """
+        Verkoop = self.env['bakker_verkoop']
+        aantal = Verkoop.search_count([])
+        stappen = [aantal] + [stap for stap in (10 ** macht for macht in range(3, 8)) if aantal < stap <= CREATE_TOT]
+        metingen = []
+        for stap in stappen:
+            if stap > aantal:
+                self._seed_verkopen(stap - aantal)
+                aantal = stap
+            naam = f"create_bij_{stap}"
+            # Naam uit de sequence, insert, creatie log en de berekende bedragen
+            with self.meet(naam, max_queries=20 * 100, budget=5):
+                for _ in range(100):
+                    Verkoop.create(self._verkoop_vals())
+            metingen.append(type(self).resultaten[naam])
+
+        eerste = metingen[0]
+        for stap, meting in zip(stappen[1:], metingen[1:]):
+            self.assertEqual(meting['queries'], eerste['queries'], f"create bij {stap} verkopen doet meer queries")
+            self.assertLessEqual(
+                meting['seconden'], 2 * eerste['seconden'] + 0.05,
+                f"create bij {stap} verkopen duurde {meting['seconden']}s, bij {stappen[0]} {eerste['seconden']}s",
+            )
+
+    def test_bevestig_betaal_annuleer(self):
+        verkopen = self._maak_concept_verkopen(20)
+        te_betalen, te_annuleren = verkopen[:10], verkopen[10:]
+        # Veldtracking logt per verkoop een bericht met tracking waarde bij elke statuswissel,
+        # daarbovenop een vast aantal queries voor voorraad, batches en statistieken
+        with self.meet('bevestig', max_queries=20 + 4 * len(verkopen), budget=0.5):
+            verkopen.action_bevestig_verkoop()
+        with self.meet('betaal', max_queries=20 + 5 * len(te_betalen), budget=0.5):
+            te_betalen.action_markeer_betaald()
+        with self.meet('annuleer', max_queries=20 + 4 * len(te_annuleren), budget=0.5):
+            te_annuleren.action_annuleer()
+        self.assertEqual(set(te_betalen.mapped('status')), {'betaald'})
+        self.assertEqual(set(te_annuleren.mapped('status')), {'geannuleerd'})
+
+    def test_batch_afrekenen(self):
+        vals_list = [{
+            'koek_id': self.koek.id,
+            'partner_id': self.klant.id,
+            'aantal': 1,
+            'prijs_per_stuk': self.koek.prijs_koek,
+            'betaal_methode': 'card',
+        } for _ in range(1000)]
+        # Met tracking: per verkoop een creatie log en twee statuswissels
+        with self.meet('batch_afrekenen_100', max_queries=40 + 8 * 100, budget=5):
+            self.env['bakker_verkoop'].create_and_settle_batch(vals_list[:100])
+        # High-volume: inserts en logs per 100 rijen, geen queries per verkoop
+        self._high_volume()
+        with self.meet('batch_afrekenen_1000_high_volume', max_queries=400, budget=10):
+            self.env['bakker_verkoop'].create_and_settle_batch(vals_list)
+
+    def _geschreven_rijen(self, verkopen):
+        """Audit berichten en tracking waarden op de verkopen"""
+        self.env.flush_all()
+        self.env.cr.execute("""
+            SELECT COUNT(DISTINCT m.id), COUNT(t.id)
+              FROM mail_message m
+         LEFT JOIN mail_tracking_value t ON t.mail_message_id = m.id
+             WHERE m.model = 'bakker_verkoop' AND m.res_id = ANY(%s)
+        """, [verkopen.ids])
+        return self.env.cr.fetchone()
+
+    def test_batch_geschreven_rijen(self):
+        """High-volume schrijft minder audit rijen en is sneller per betaalde verkoop"""
+        Verkoop = self.env['bakker_verkoop']
+        vals_list = [self._verkoop_vals() for _ in range(100)]
+        with self.meet('geschreven_rijen_standaard', max_queries=40 + 8 * 100, budget=5):
+            standaard = Verkoop.create_and_settle_batch(vals_list)
+        berichten_standaard, tracking_standaard = self._geschreven_rijen(standaard)
+        self._high_volume()
+        with self.meet('geschreven_rijen_high_volume', max_queries=100, budget=2):
+            high_volume = Verkoop.create_and_settle_batch(vals_list)
+        berichten_high_volume, tracking_high_volume = self._geschreven_rijen(high_volume)
+        for naam, berichten, tracking in [
+            ('geschreven_rijen_standaard', berichten_standaard, tracking_standaard),
+            ('geschreven_rijen_high_volume', berichten_high_volume, tracking_high_volume),
+        ]:
+            type(self).resultaten[naam].update({'berichten': berichten, 'tracking_waarden': tracking})
+
+        # Standaard: een creatie bericht en twee statuswissels met tracking per verkoop
+        self.assertGreaterEqual(berichten_standaard, 3 * len(standaard))
+        self.assertGreaterEqual(tracking_standaard, 2 * len(standaard))
+        # High-volume: één compacte log per verkoop per statuswissel, geen tracking waarden
+        self.assertLessEqual(berichten_high_volume, 2 * len(high_volume))
+        self.assertEqual(tracking_high_volume, 0)
+        self.assertLess(
+            type(self).resultaten['geschreven_rijen_high_volume']['seconden'],
+            type(self).resultaten['geschreven_rijen_standaard']['seconden'],
+        )
+
+    def test_kassa_sync(self):
+        """Speel AANTAL_KASSA_VERKOPEN verkopen af van 20 kassa's in batches van 100, na elkaar
+
+        Telt de queries per batch; gelijktijdige kassa's zitten in TestBakkerKassaGelijktijdig.
+        """
+        koeken = self.env['bakker_koeken'].search([('name_koek', '=like', 'Perf Koek %')], limit=200)
+        kassas = [f"kassa-{nummer}" for nummer in range(20)]
+        batches = []
+        for start in range(0, AANTAL_KASSA_VERKOPEN, 100):
+            kassa = kassas[(start // 100) % len(kassas)]
+            batches.append((kassa, [{
+                'sleutel': f"{kassa}-{volgnummer}",
+                'koek_id': koeken[volgnummer % len(koeken)].id,
+                'aantal': 1 + volgnummer % 3,
+                'betaal_methode': 'card',
+            } for volgnummer in range(start, min(start + 100, AANTAL_KASSA_VERKOPEN))]))
+        Verkoop = self.env['bakker_verkoop']
+        self._high_volume()
+        with self.meet('kassa_sync', max_queries=80 * len(batches), budget=AANTAL_KASSA_VERKOPEN / 100):
+            for kassa, regels in batches:
+                antwoord = Verkoop._verwerk_kassa_batch(kassa, regels)
+                self.assertEqual({resultaat['status'] for resultaat in antwoord['resultaten']}, {'ok'})
+
+        # Een herhaalde batch, bv. na een time-out, boekt niets opnieuw
+        kassa, regels = batches[0]
+        aantal_verkopen = Verkoop.search_count([])
+        with self.meet('kassa_sync_herhaald', max_queries=40, budget=0.5):
+            antwoord = Verkoop._verwerk_kassa_batch(kassa, regels)
+        self.assertEqual({resultaat['status'] for resultaat in antwoord['resultaten']}, {'duplicaat'})
+        self.assertEqual(Verkoop.search_count([]), aantal_verkopen)
+
+    def test_kanban_laden(self):
+        specificatie = {
+            'name_koek': {},
+            'prijs_koek': {},
+            'voorraad_koek': {},
+            'vervaldatum_koek': {},
+            'pudding_koek': {},
+            'categorie_koek_id': {'fields': {'display_name': {}}},
+            'tags_ids': {'fields': {'display_name': {}, 'color': {}}},
+            'totaal_verkocht': {},
+            'totaal_omzet': {},
+            'verkoop_count': {},
+        }
+        Koeken = self.env['bakker_koeken']
+        # Per kolom: search met de opgeslagen velden, search_count, de tags relatie,
+        # de tags zelf en de verkoop_count GROUP BY. Niets hangt af van het aantal verkopen.
+        with self.meet('kanban_laden', max_queries=2 + 6 * len(self.categorieen), budget=1):
+            Koeken.read_group([], ['totaal_inventarisatie:sum'], ['categorie_koek_id'])
+            for categorie in self.categorieen:
+                Koeken.web_search_read([('categorie_koek_id', '=', categorie.id)], specificatie, limit=40)
+
+    def test_tags_grote_selectie(self):
+        """Tag acties op een selectie van tot 10000 koeken, zonder queries per koek"""
+        koeken = self.env['bakker_koeken'].search([('name_koek', '=like', 'Perf Koek %')], limit=10000)
+        # De ORM splitst IN lijsten per 1000 ids, verder een vast aantal queries
+        per_duizend = len(koeken) // 1000 + 1
+        with self.meet('tag_populair', max_queries=20 + 4 * per_duizend, budget=2):
+            koeken.action_mark_populair()
+        self.assertEqual(len(koeken.filtered(lambda koek: self.env.ref('Bakker.tag_populair') in koek.tags_ids)), len(koeken))
+        # Plus één write per prijs, de geseede koeken hebben 50 verschillende prijzen
+        with self.meet('tag_seizoen', max_queries=20 + 4 * per_duizend + 3 * 50, budget=5):
+            koeken.action_seizoen_special()
+
+    def test_bijvullen_grote_selectie(self):
+        """Voorraad bijvullen van tot 10000 koeken met vaste queries per 1000 koeken"""
+        koeken = self.env['bakker_koeken'].search([('name_koek', '=like', 'Perf Koek %')], limit=10000)
+        voorraad = dict(zip(koeken.ids, koeken.mapped('voorraad_koek')))
+        per_duizend = len(koeken) // 1000 + 1
+        # Voorstellen, koeken locken, batches, voorraad en aankoopdatum in bulk
+        with self.meet('bijvullen', max_queries=30 + 6 * per_duizend, budget=5):
+            koeken.action_voorraad_bijvullen()
+        with self.meet('verse_batch', max_queries=30 + 10 * per_duizend, budget=5):
+            koeken.action_verse_batch()
+        self.assertEqual(
+            {koek.id: koek.voorraad_koek for koek in koeken},
+            {koek_id: aantal + 20 + 30 for koek_id, aantal in voorraad.items()},
+        )
+
+    def test_zoeken(self):
+        Koeken = self.env['bakker_koeken']
+        categorie = self.categorieen[0]
+        # Categorie filter op id en autocomplete op naam via de trigram index
+        with self.meet('filter_categorie', max_queries=2, budget=0.05):
+            Koeken.search([('categorie_koek_id', '=', categorie.id)], limit=80)
+        with self.meet('autocomplete_naam', max_queries=2, budget=0.05):
+            Koeken.search([('name_koek', 'ilike', 'koek 123')], limit=8)
+        with self.meet('autocomplete_categorie', max_queries=2, budget=0.05):
+            self.env['bakker_koeken_categorie'].name_search('perf cat', limit=8)
+
+    def _seq_scans(self, query):
+        """Tabellen die het query plan volledig doorloopt"""
+        self.env.cr.execute(SQL("EXPLAIN (FORMAT JSON) %s", query.select()))
+        knopen, tabellen = [self.env.cr.fetchone()[0][0]['Plan']], set()
+        while knopen:
+            knoop = knopen.pop()
+            if knoop['Node Type'] == 'Seq Scan':
+                tabellen.add(knoop['Relation Name'])
+            knopen.extend(knoop.get('Plans', []))
+        return tabellen
+
+    def test_index_gebruik(self):
+        """De drukke zoekopdrachten op verkopen gebruiken een index, geen sequentiële scan"""
+        Verkoop = self.env['bakker_verkoop']
+        andere_klant = self.env['res.partner'].create({'name': 'Perf Klant Zonder Verkopen'})
+        self.env.flush_all()
+        self.env.cr.execute("ANALYZE bakker_verkoop")
+        self.env.cr.execute("SELECT MAX(write_date) FROM bakker_verkoop")
+        laatste_wijziging = self.env.cr.fetchone()[0]
+        koek_ids = self.env['bakker_koeken'].search([('name_koek', '=like', 'Perf Koek %')], limit=5).ids
+        zoekopdrachten = {
+            # action_view_verkopen
+            'verkopen_van_koek': Verkoop._search([('koek_id', '=', self.koek.id)], limit=80, order='verkoop_datum desc'),
+            # statistieken en reconciliatie per koek
+            'betaald_per_koek': Verkoop._search([('koek_id', 'in', koek_ids), ('status', '=', 'betaald')]),
+            # standaard lijst
+            'lijst': Verkoop._search([], limit=80, order='verkoop_datum desc, id desc'),
+            'klant': Verkoop._search([('partner_id', '=', andere_klant.id)], limit=80),
+            # incrementele export en rapport verversing
+            'gewijzigd': Verkoop._search([('write_date', '>=', laatste_wijziging)]),
+        }
+        for naam, query in zoekopdrachten.items():
+            with self.subTest(naam):
+                self.assertNotIn('bakker_verkoop', self._seq_scans(query))
+
+    def test_dashboard(self):
+        Koeken = self.env['bakker_koeken'].with_context(bakker_dashboard=True)
+        Dashboard = self.env['bakker_dashboard']
+        with self.meet('dashboard_koud', max_queries=3, budget=1):
+            Dashboard._snapshot()
+        # Zonder wijzigingen enkel de sleutel query
+        with self.meet('dashboard_warm', max_queries=1, budget=0.01):
+            Dashboard._snapshot()
+        with self.meet('dashboard_kanban_kolommen', max_queries=6, budget=0.1):
+            groepen = Koeken.web_read_group([], ['totaal_inventarisatie:sum'], ['categorie_koek_id'])['groups']
+        self.assertIn('vandaag', groepen[0]['categorie_koek_id'][1])
+
+        # Een verkoop maakt de snapshot ongeldig
+        omzet = Dashboard._snapshot()[self.koek.categorie_koek_id.id]['omzet_vandaag']
+        self.koek.snelle_verkoop(self.koek.id)
+        self.assertGreater(Dashboard._snapshot()[self.koek.categorie_koek_id.id]['omzet_vandaag'], omzet)
+        # Verwijderen ook, via de teller van verwijderingen in de sleutel
+        self.env['bakker_verkoop'].search([('koek_id', '=', self.koek.id)], order='id desc', limit=1).unlink()
+        self.assertAlmostEqual(Dashboard._snapshot()[self.koek.categorie_koek_id.id]['omzet_vandaag'], omzet)
+        # Een koek verwijderen, zonder het aantal koeken te tellen
+        categorie = self.koek.categorie_koek_id.id
+        koek = Koeken.create({'name_koek': 'Perf Wegwerp', 'prijs_koek': 1.0, 'voorraad_koek': 5, 'categorie_koek_id': categorie})
+        waarde = Dashboard._snapshot()[categorie]['voorraad_waarde']
+        koek.unlink()
+        self.assertAlmostEqual(Dashboard._snapshot()[categorie]['voorraad_waarde'], waarde - 5.0)
+
+    def test_rapport_pivot(self):
+        Rapport = self.env['bakker_verkoop_rapport']
+        with self.meet('rapport_pivot', max_queries=10, budget=1):
+            Rapport.read_group(
+                [('status', '=', 'betaald')], ['aantal:sum', 'omzet:sum'],
+                ['categorie_koek_id', 'datum:month'], lazy=False,
+            )
+            Rapport.read_group([], ['omzet:sum'], ['tags_ids'], lazy=False)
+
+    def test_bijvul_prognose(self):
+        if numpy is None:
+            self.skipTest("numpy niet beschikbaar")
+        # Eén query voor de historiek, ongeacht het aantal koeken
+        with self.meet('bijvul_prognose', max_queries=40, budget=10):
+            voorstellen = self.env['bakker_bijvul_voorstel']._maak_voorstellen()
+        with self.meet('bijvul_toepassen', max_queries=60, budget=10):
+            voorstellen.action_toepassen()
+        self.assertEqual(set(voorstellen.mapped('status')) - {'toegepast'}, set())
+
+    def test_archiveren(self):
+        Verkoop = self.env['bakker_verkoop']
+        Koeken = self.env['bakker_koeken']
+
+        def hot_queries(naam):
+            with self.meet(naam, max_queries=4, budget=0.1):
+                Verkoop.search([], limit=80)
+                Verkoop.search_count([('status', '=', 'bevestigd')])
+                Verkoop._read_group([('koek_id', '=', self.koek.id)], ['koek_id'], ['__count'])
+
+        stats = {koek.id: (koek.totaal_verkocht, koek.totaal_omzet) for koek in Koeken.search([])}
+        hot_queries('hot_voor_archief')
+
+        grens = fields.Datetime.now() - timedelta(days=30)
+        with self.meet('archiveren', max_queries=20 * (AANTAL_VERKOPEN // 5000 + 2), budget=AANTAL_VERKOPEN / 1000):
+            while self.env['bakker_verkoop_archief']._archiveer_batch(grens, 5000) == 5000:
+                pass
+        self.assertFalse(Verkoop.search_count([('status', 'in', ('betaald', 'geannuleerd')), ('verkoop_datum', '<', grens)]))
+        hot_queries('hot_na_archief')
+
+        # Statistieken en rapport blijven ongewijzigd
+        self.env.invalidate_all()
+        self.assertEqual({koek.id: (koek.totaal_verkocht, koek.totaal_omzet) for koek in Koeken.search([])}, stats)
+        self.assertFalse(Koeken._cron_reconcilieer_verkoop_stats())
+
+    def test_factuur_render(self):
+        if self.env['ir.actions.report'].get_wkhtmltopdf_state() != 'ok':
+            self.skipTest("wkhtmltopdf niet beschikbaar")
+        verkopen = self.env['bakker_verkoop'].search([('status', '=', 'betaald')], limit=20)
+        with self.meet('factuur_render_20', max_queries=400, budget=60):
+            verkopen._render_facturen()
+        # Ongewijzigde facturen worden niet opnieuw gerenderd
+        with self.meet('factuur_cache_20', max_queries=80, budget=1):
+            verkopen._render_facturen()
+
+
+@tagged('post_install', '-at_install', '-standard', 'bakker_perf')
+class TestBakkerKassaGelijktijdig(BakkerGelijktijdigCase):
+    """Kassa's die tegelijk synchroniseren, elk in een eigen thread met een eigen cursor"""
+
+    KASSAS = 8
+    VOORRAAD = 1000000
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.koek_ids = cls._maak_koeken(10, cls.VOORRAAD)
+        with cls.registry.cursor() as cr:
+            api.Environment(cr, SUPERUSER_ID, {})['ir.config_parameter'].set_param('Bakker.verkoop_high_volume', 'True')
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.registry.cursor() as cr:
+            api.Environment(cr, SUPERUSER_ID, {})['ir.config_parameter'].set_param('Bakker.verkoop_high_volume', 'False')
+        super().tearDownClass()
+
+    def _sync(self, kassa, batches, antwoorden, fouten):
+        """Zoals de controller: elke batch in een eigen transactie, opnieuw bij een conflict"""
+        try:
+            for regels in batches:
+                antwoorden.append(in_eigen_transactie(
+                    self.registry, lambda env: env['bakker_verkoop']._verwerk_kassa_batch(kassa, regels),
+                ))
+        except Exception as e:
+            fouten.append(e)
+
+    def _batches(self, kassa, aantal):
+        regels = [{
+            'sleutel': str(volgnummer),
+            'koek_id': self.koek_ids[volgnummer % len(self.koek_ids)],
+            'aantal': 1 + volgnummer % 3,
+            'betaal_methode': 'card',
+        } for volgnummer in range(aantal)]
+        return [regels[start:start + 100] for start in range(0, aantal, 100)]
+
+    def test_kassas_tegelijk(self):
+        per_kassa = max(AANTAL_KASSA_VERKOPEN // self.KASSAS, 100)
+        # Alle kassa's nummeren vanaf 0: de sleutels zijn enkel uniek per kassa
+        werk = {f"gelijktijdig-{nummer}": self._batches(f"gelijktijdig-{nummer}", per_kassa) for nummer in range(self.KASSAS)}
+        antwoorden, fouten = [], []
+        taken = [
+            lambda kassa=kassa, batches=batches: self._sync(kassa, batches, antwoorden, fouten)
+            for kassa, batches in werk.items()
+        ]
+        # Dezelfde eerste batch nog eens, tegelijk, zoals na een time-out van de kassa
+        kassa = next(iter(werk))
+        taken.append(lambda: self._sync(kassa, werk[kassa][:1], antwoorden, fouten))
+
+        duur = self._parallel(taken)
+        self.assertFalse(fouten, fouten)
+
+        statussen = [resultaat['status'] for antwoord in antwoorden for resultaat in antwoord['resultaten']]
+        totaal = per_kassa * self.KASSAS
+        self.assertEqual(statussen.count('ok'), totaal)
+        self.assertEqual(statussen.count('duplicaat'), len(werk[kassa][0]))
+        self.assertLessEqual(duur, totaal / 100, f"{totaal} kassa verkopen duurden {duur:.1f}s")
+
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            koeken = env['bakker_koeken'].browse(self.koek_ids)
+            verkocht = dict(env['bakker_verkoop']._read_group(
+                [('koek_id', 'in', self.koek_ids), ('status', '=', 'betaald')], ['koek_id'], ['aantal:sum'],
+            ))
+            self.assertEqual(sum(verkocht.values()), sum(
+                regel['aantal'] for batches in werk.values() for regels in batches for regel in regels
+            ))
+            for koek in koeken:
+                # Geen verloren updates: voorraad, batches en statistieken kloppen met de verkopen
+                self.assertEqual(koek.voorraad_koek, self.VOORRAAD - verkocht[koek])
+                self.assertEqual(sum(koek.batch_ids.mapped('resterend')), koek.voorraad_koek)
+                self.assertEqual(koek.totaal_verkocht, verkocht[koek])
+
+
+@tagged('post_install', '-at_install', '-standard', 'bakker_perf')
+class TestBakkerVoorraadGelijktijdig(BakkerGelijktijdigCase):
+    """Veel verkopen van één populaire koek die tegelijk bevestigd worden"""
+
+    THREADS = 8
+    VOORRAAD = 100
+    VERKOPEN = 200
+
+    def test_bevestigen_tegelijk(self):
+        koek_id = self._maak_koeken(1, self.VOORRAAD)[0]
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            verkoop_ids = env['bakker_verkoop'].create([{
+                'koek_id': koek_id,
+                'partner_id': env['bakker_koeken']._walk_in_klant().id,
+                'aantal': 1,
+                'prijs_per_stuk': 2.0,
+                'betaal_methode': 'cash',
+            } for _ in range(self.VERKOPEN)]).ids
+
+        bevestigd, tekort, fouten = [], [], []
+
+        def bevestig(ids):
+            for verkoop_id in ids:
+                try:
+                    in_eigen_transactie(self.registry, lambda env: env['bakker_verkoop'].browse(verkoop_id).action_bevestig_verkoop())
+                    bevestigd.append(verkoop_id)
+                except ValidationError:
+                    tekort.append(verkoop_id)
+                except Exception as e:
+                    fouten.append(e)
+
+        self._parallel([
+            lambda ids=verkoop_ids[start::self.THREADS]: bevestig(ids) for start in range(self.THREADS)
+        ])
+        # Geen deadlocks of serialisatie fouten die de herhalingen niet opvangen
+        self.assertFalse(fouten, fouten)
+        self.assertEqual(len(bevestigd), self.VOORRAAD)
+        self.assertEqual(len(tekort), self.VERKOPEN - self.VOORRAAD)
+
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            koek = env['bakker_koeken'].browse(koek_id)
+            # Niet meer verkocht dan er was
+            self.assertEqual(koek.voorraad_koek, 0)
+            self.assertEqual(sum(koek.batch_ids.mapped('resterend')), 0)
+            self.assertEqual(env['bakker_verkoop'].search_count([('koek_id', '=', koek_id), ('status', '=', 'bevestigd')]), self.VOORRAAD)
+
+
+@tagged('post_install', '-at_install', '-standard', 'bakker_perf')
+class TestBakkerSnelleVerkoopLast(BakkerGelijktijdigCase):
+    """Snelle verkopen aan een vast tempo, elk in een eigen gecommitte transactie"""
+
+    PER_SECONDE = 50
+    MAX_P99 = 0.05
+
+    def test_snelle_verkoop_p99(self):
+        koek_ids = self._maak_koeken(10, 1000000)
+        latenties = []
+        interval = 1 / self.PER_SECONDE
+        start = time.perf_counter()
+        for nummer in range(AANTAL_SNELLE_VERKOPEN):
+            # Vast schema: een trage verkoop schuift de volgende niet op, die start meteen
+            wachten = start + nummer * interval - time.perf_counter()
+            if wachten > 0:
+                time.sleep(wachten)
+            begin = time.perf_counter()
+            in_eigen_transactie(self.registry, lambda env: env['bakker_koeken'].snelle_verkoop(koek_ids[nummer % len(koek_ids)]))
+            latenties.append(time.perf_counter() - begin)
+
+        latenties.sort()
+        p99 = latenties[math.ceil(0.99 * len(latenties)) - 1]
+        self.assertLess(p99, self.MAX_P99, f"p99 van {len(latenties)} snelle verkopen is {p99 * 1000:.1f} ms")
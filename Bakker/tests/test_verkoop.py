@@ -0,0 +1,128 @@
+from odoo.exceptions import ValidationError
+from odoo.tests import tagged
+
+from odoo.addons.Bakker.models.bakker_verkoop import FACTUUR_BATCH
+
+from .common import BakkerCase
+
+
+@tagged('post_install', '-at_install')
+class TestBakkerVerkoop(BakkerCase):
+
+    def test_batch_afrekenen_volgt_statussen(self):
+        verkopen = self.env['bakker_verkoop'].create_and_settle_batch([
+            self._verkoop_vals(aantal=2),
+            self._verkoop_vals(koek=self.andere_koek, aantal=3),
+        ])
+        self.assertEqual(set(verkopen.mapped('status')), {'betaald'})
+        self.assertEqual(self.koek.voorraad_koek, 48)
+        self.assertEqual(self.andere_koek.voorraad_koek, 7)
+        self.assertEqual(self.koek.totaal_verkocht, 2)
+        self.assertEqual(self.andere_koek.totaal_omzet, 12.0)
+
+    def test_batch_afrekenen_te_weinig_voorraad(self):
+        with self.assertRaises(ValidationError):
+            self.env['bakker_verkoop'].create_and_settle_batch([
+                self._verkoop_vals(aantal=2),
+                self._verkoop_vals(koek=self.andere_koek, aantal=11),
+            ])
+        # Alles of niets: ook de andere koek is niet gereserveerd
+        self.assertEqual(self.koek.voorraad_koek, 50)
+
+    def test_batch_afrekenen_enkel_nieuwe_verkopen(self):
+        with self.assertRaises(ValidationError):
+            self.env['bakker_verkoop'].create_and_settle_batch([self._verkoop_vals(status='bevestigd')])
+
+    def test_bevestig_en_betaal(self):
+        verkoop = self.env['bakker_verkoop'].create(self._verkoop_vals(aantal=4))
+        with self.assertRaises(ValidationError):
+            verkoop.action_markeer_betaald()
+        verkoop.action_bevestig_verkoop()
+        self.assertEqual(self.koek.voorraad_koek, 46)
+        with self.assertRaises(ValidationError):
+            verkoop.action_bevestig_verkoop()
+        verkoop.action_markeer_betaald()
+        self.assertEqual(verkoop.status, 'betaald')
+        self.assertEqual(self.koek.totaal_verkocht, 4)
+
+    def test_stats_volgen_wijzigingen(self):
+        Verkoop = self.env['bakker_verkoop']
+        betaald = Verkoop.create_and_settle_batch([self._verkoop_vals(aantal=2), self._verkoop_vals(aantal=3)])
+        concept = Verkoop.create(self._verkoop_vals(aantal=5))
+        self.assertEqual(self.koek.totaal_verkocht, 5)
+        self.assertAlmostEqual(self.koek.totaal_omzet, 12.5)
+
+        # Aantal, prijs en korting van een betaalde verkoop
+        betaald[0].write({'aantal': 4, 'korting_percentage': 10})
+        self.assertEqual(self.koek.totaal_verkocht, 7)
+        self.assertAlmostEqual(self.koek.totaal_omzet, 4 * 2.5 * 0.9 + 3 * 2.5)
+
+        # Verhuizen naar een andere koek
+        betaald[1].koek_id = self.andere_koek
+        self.assertEqual(self.koek.totaal_verkocht, 4)
+        self.assertEqual(self.andere_koek.totaal_verkocht, 3)
+
+        # Concept verkopen tellen niet mee tot ze betaald zijn
+        concept.action_bevestig_verkoop()
+        self.assertEqual(self.koek.totaal_verkocht, 4)
+        concept.action_markeer_betaald()
+        self.assertEqual(self.koek.totaal_verkocht, 9)
+
+        (betaald | concept).unlink()
+        self.assertEqual(self.koek.totaal_verkocht, 0)
+        self.assertAlmostEqual(self.koek.totaal_omzet, 0.0)
+        self.assertEqual(self.andere_koek.totaal_verkocht, 0)
+        # Geen drift: de reconciliatie vindt niets om te corrigeren
+        self.assertEqual(self.env['bakker_koeken']._cron_reconcilieer_verkoop_stats(), 0)
+
+    def test_reconciliatie_herstelt_drift(self):
+        self.env['bakker_verkoop'].create_and_settle_batch([self._verkoop_vals(aantal=2)])
+        self.env.flush_all()
+        self.env.cr.execute("UPDATE bakker_koeken SET totaal_verkocht = 99 WHERE id = %s", [self.koek.id])
+        self.koek.invalidate_recordset(['totaal_verkocht'])
+        self.assertEqual(self.env['bakker_koeken']._cron_reconcilieer_verkoop_stats(), 1)
+        self.assertEqual(self.koek.totaal_verkocht, 2)
+
+    def test_facturen_bundel_hergebruikt(self):
+        if self.env['ir.actions.report'].get_wkhtmltopdf_state() != 'ok':
+            self.skipTest("wkhtmltopdf niet beschikbaar")
+        verkopen = self.env['bakker_verkoop'].create_and_settle_batch([self._verkoop_vals(), self._verkoop_vals()])
+        eerste = verkopen.action_print_alle_facturen()
+        self.assertEqual(verkopen.action_print_alle_facturen()['url'], eerste['url'])
+        # Een andere selectie geeft een andere bundel
+        self.assertNotEqual(verkopen[:1].action_print_alle_facturen()['url'], eerste['url'])
+        # Een andere gebruiker krijgt een eigen bundel die ze mag downloaden
+        gebruiker = self.env['res.users'].create({
+            'name': 'Bakker Verkoper',
+            'login': 'bakker_verkoper',
+            'groups_id': [(6, 0, [self.env.ref('base.group_user').id])],
+        })
+        actie = verkopen.with_user(gebruiker).action_print_alle_facturen()
+        self.assertNotEqual(actie['url'], eerste['url'])
+        bundel_id = int(actie['url'].split('/')[-1].split('?')[0])
+        self.assertTrue(self.env['ir.attachment'].with_user(gebruiker).browse(bundel_id).raw)
+
+    def test_grote_selectie_facturen_in_wachtrij(self):
+        verkopen = self.env['bakker_verkoop'].create([self._verkoop_vals() for _ in range(FACTUUR_BATCH + 1)])
+        self.env.flush_all()
+        self.env.cr.execute("UPDATE bakker_verkoop SET write_date = '2020-01-01' WHERE id = ANY(%s)", [verkopen.ids])
+        verkopen.invalidate_recordset(['write_date'])
+        actie = verkopen.action_print_alle_facturen()
+        self.assertEqual(actie['tag'], 'display_notification')
+        self.assertTrue(all(verkopen.mapped('factuur_in_wachtrij')))
+        self.assertFalse(verkopen.factuur_attachment_id)
+        # Renderen is geen wijziging: geen nieuwe export, rapport verversing of dashboard sleutel
+        self.assertEqual({str(datum) for datum in verkopen.mapped('write_date')}, {'2020-01-01 00:00:00'})
+
+    def test_kassa_sleutel_per_kassa(self):
+        Verkoop = self.env['bakker_verkoop']
+        regels = [{'sleutel': '1', 'koek_id': self.koek.id, 'aantal': 2}]
+        eerste = Verkoop._verwerk_kassa_batch('kassa-1', regels)
+        # Een andere kassa mag dezelfde sleutel gebruiken
+        andere = Verkoop._verwerk_kassa_batch('kassa-2', regels)
+        herhaald = Verkoop._verwerk_kassa_batch('kassa-1', regels)
+        self.assertEqual(eerste['resultaten'][0]['status'], 'ok')
+        self.assertEqual(andere['resultaten'][0]['status'], 'ok')
+        self.assertEqual(herhaald['resultaten'][0]['status'], 'duplicaat')
+        self.assertEqual(herhaald['resultaten'][0]['verkoop_id'], eerste['resultaten'][0]['verkoop_id'])
+        self.assertEqual(self.koek.voorraad_koek, 46)
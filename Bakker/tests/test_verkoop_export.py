@@ -0,0 +1,85 @@
+import csv
+import io
+from datetime import timedelta
+
+from odoo.tests import tagged
+
+from odoo.addons.Bakker.models.bakker_verkoop_export import PARQUET_SCHEMA, pyarrow
+
+from .common import BakkerCase
+
+
+@tagged('post_install', '-at_install')
+class TestBakkerVerkoopExport(BakkerCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Export = cls.env['bakker_verkoop_export']
+        cls.verkopen = cls.env['bakker_verkoop'].create([cls._verkoop_vals(aantal=i + 1) for i in range(5)])
+        # Gewijzigd voor de veiligheidsmarge van een export die nu start
+        cls._zet_write_date(cls.verkopen, cls.env.cr.now() - timedelta(hours=1))
+
+    @classmethod
+    def _zet_write_date(cls, verkopen, write_date):
+        cls.env.flush_all()
+        cls.env.cr.execute("UPDATE bakker_verkoop SET write_date = %s WHERE id = ANY(%s)", [write_date, verkopen.ids])
+        verkopen.invalidate_recordset(['write_date'])
+
+    def _csv_ids(self, export):
+        rijen = list(csv.DictReader(io.StringIO(export.attachment_id.raw.decode())))
+        return {int(rij['id']) for rij in rijen}
+
+    def test_chunks(self):
+        self.patch(type(self.Export), 'CHUNK', 2)
+        chunks = list(self.Export._lees_chunks(False, self.env.cr.now()))
+        ids = [rij[0] for rijen in chunks for rij in rijen]
+        self.assertTrue(all(len(rijen) <= 2 for rijen in chunks))
+        self.assertEqual(ids, sorted(ids), "keyset paginering op id")
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertLessEqual(set(self.verkopen.ids), set(ids))
+
+    def test_csv_incrementeel(self):
+        self.patch(type(self.Export), 'CHUNK', 2)
+        volledig = self.Export.create({'formaat': 'csv', 'incrementeel': False})
+        volledig.action_exporteer()
+        self.assertLessEqual(set(self.verkopen.ids), self._csv_ids(volledig))
+        self.assertEqual(volledig.aantal_rijen, len(self._csv_ids(volledig)))
+        # In blokken naar de filestore, niet geïndexeerd als tekst
+        attachment = volledig.attachment_id
+        self.assertEqual(attachment.mimetype, 'application/octet-stream')
+        self.assertFalse(attachment.index_content)
+        self.assertEqual(attachment.file_size, len(attachment.raw))
+
+        # Een transactie die voor de vorige export begon maar pas erna committe
+        laat = self.env['bakker_verkoop'].create(self._verkoop_vals())
+        self._zet_write_date(laat, volledig.watermark + timedelta(seconds=1))
+        incrementeel = self.Export.create({'formaat': 'csv', 'incrementeel': True})
+        incrementeel.action_exporteer()
+        self.assertEqual(incrementeel.vanaf, volledig.watermark)
+        self.assertEqual(self._csv_ids(incrementeel), set(laat.ids))
+
+    def test_parquet_schema(self):
+        if pyarrow is None:
+            self.skipTest("pyarrow niet geïnstalleerd")
+        self.patch(type(self.Export), 'CHUNK', 2)
+        export = self.Export.create({'formaat': 'parquet', 'incrementeel': False})
+        export.action_exporteer()
+        tabel = pyarrow.parquet.read_table(io.BytesIO(export.attachment_id.raw))
+        self.assertEqual(tabel.schema, PARQUET_SCHEMA)
+        self.assertEqual(tabel.num_rows, export.aantal_rijen)
+        self.assertLessEqual(set(self.verkopen.ids), set(tabel.column('id').to_pylist()))
+
+    def test_volledige_export_bevat_archief(self):
+        oud = self.env['bakker_verkoop'].create_and_settle_batch([
+            self._verkoop_vals(verkoop_datum=self.env.cr.now() - timedelta(days=800)),
+        ])
+        self._zet_write_date(oud, self.env.cr.now() - timedelta(hours=1))
+        oud_id = oud.id
+        self.env['bakker_verkoop_archief']._archiveer_batch(self.env.cr.now() - timedelta(days=400), 1000)
+        self.assertFalse(oud.exists())
+
+        volledig = self.Export.create({'formaat': 'csv', 'incrementeel': False})
+        volledig.action_exporteer()
+        self.assertIn(oud_id, self._csv_ids(volledig))
+        self.assertLessEqual(set(self.verkopen.ids), self._csv_ids(volledig))
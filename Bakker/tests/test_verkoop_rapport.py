@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import BakkerCase
+
+
+@tagged('post_install', '-at_install')
+class TestBakkerVerkoopRapport(BakkerCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Rapport = cls.env['bakker_verkoop_rapport']
+        cls.gisteren = fields.Datetime.now() - timedelta(days=1)
+        cls.verkopen = cls.env['bakker_verkoop'].create_and_settle_batch([
+            cls._verkoop_vals(aantal=2, verkoop_datum=cls.gisteren),
+            cls._verkoop_vals(aantal=3, verkoop_datum=cls.gisteren),
+        ])
+        cls.Rapport._cron_ververs_rapport()
+
+    def _rapport(self, dag):
+        return self.Rapport.search([('koek_id', '=', self.koek.id), ('datum', '=', dag)])
+
+    def test_volledige_opbouw(self):
+        rapport = self._rapport(self.gisteren.date())
+        self.assertEqual(sum(rapport.mapped('aantal')), 5)
+        self.assertEqual(sum(rapport.mapped('aantal_verkopen')), 2)
+        self.assertAlmostEqual(sum(rapport.mapped('omzet')), 12.5)
+
+    def test_incrementeel_met_veiligheidsmarge(self):
+        nieuw = self.env['bakker_verkoop'].create_and_settle_batch([self._verkoop_vals(aantal=4)])
+        self.env.flush_all()
+        # Een transactie die begon voor de vorige run maar pas erna committe
+        watermark = self.env['ir.config_parameter'].sudo().get_param(self.Rapport.WATERMARK_PARAM)
+        self.env.cr.execute(
+            "UPDATE bakker_verkoop SET write_date = %s::timestamp + interval '1 second' WHERE id = %s",
+            [watermark, nieuw.id],
+        )
+        self.Rapport._cron_ververs_rapport()
+        self.assertEqual(sum(self._rapport(nieuw.verkoop_datum.date()).mapped('aantal')), 4)
+
+    def test_verplaatste_verkoop_ververst_oude_dag(self):
+        eergisteren = self.gisteren - timedelta(days=1)
+        self.verkopen[0].verkoop_datum = eergisteren
+        self.Rapport._cron_ververs_rapport()
+        self.assertEqual(sum(self._rapport(self.gisteren.date()).mapped('aantal')), 3)
+        self.assertEqual(sum(self._rapport(eergisteren.date()).mapped('aantal')), 2)
+
+    def test_categorie_en_tags_van_koek(self):
+        categorie = self.env['bakker_koeken_categorie'].create({'name': 'Nieuwe Categorie'})
+        tag = self.env['bakker_koeken_tags'].create({'name': 'Nieuwe Tag'})
+        self.koek.write({'categorie_koek_id': categorie.id, 'tags_ids': [(4, tag.id)]})
+        rapport = self._rapport(self.gisteren.date())
+        self.assertEqual(rapport.categorie_koek_id, categorie)
+        self.assertEqual(rapport.tags_ids, tag)